@@ -0,0 +1,102 @@
+"""Compare per-row and batched normalization of asset paths.
+
+Usage: python -m benchmarks.asset_paths [--rows 10000] [--distinct 10 100 1000 10000] [--repeat 5]
+
+A column of ``--rows`` paths drawn from ``--distinct`` different ones is
+normalized the way the cookers did it row by row, then through
+``normalize_paths`` and a lookup per row.
+"""
+
+import argparse
+from collections.abc import Callable
+import random
+import re
+import time
+
+from json_cooker.asset_paths import (
+    Normalizer,
+    asset_suffixes,
+    normalize_paths,
+    strip_avatar_dirs,
+    zzz_ui_icons,
+)
+
+CASES: list[tuple[str, str, Callable[[str], str], Normalizer]] = [
+    (
+        "hsr skill tree",
+        "SpriteOutput/AvatarSkillTree/Avatar/{id}/SkillIcon_{id}_Normal.png",
+        lambda path: re.sub(r"Avatar/(\d+)/", "", path),
+        strip_avatar_dirs,
+    ),
+    (
+        "zzz namecard",
+        "Assets/NapResources/UI/Sprite/A1DynamicLoad/FriendCard/UnPacker/Img{id}.png",
+        lambda path: f"/ui/zzz/{path.split('/')[-1]}",
+        zzz_ui_icons,
+    ),
+    (
+        "zzz title",
+        "Assets/NapResources/UI/Materials/General/UI_Title_{id}.mat",
+        lambda path: path.split("_")[-1].split(".")[0],
+        asset_suffixes,
+    ),
+]
+
+
+def per_row(paths: list[str], normalize: Callable[[str], str]) -> list[str]:
+    return [normalize(path) for path in paths]
+
+
+def batched(paths: list[str], normalize: Normalizer) -> list[str]:
+    normalized = normalize_paths(paths, normalize)
+    return [normalized[path] for path in paths]
+
+
+def best(func: Callable[[], list[str]], repeat: int) -> tuple[float, list[str]]:
+    elapsed = float("inf")
+    result: list[str] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return elapsed, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument(
+        "--distinct", type=int, nargs="+", default=[10, 100, 1000, 10_000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(
+        f"{'Case':<15} {'Distinct':>8} {'Per row (ms)':>13} {'Batched (ms)':>13} "
+        f"{'Speedup':>8}"
+    )
+    for name, template, row_normalize, normalize in CASES:
+        for distinct in args.distinct:
+            choices = [template.format(id=1001 + i) for i in range(distinct)]
+            paths = random.choices(choices, k=args.rows)
+
+            row_time, expected = best(
+                lambda paths=paths, row_normalize=row_normalize: per_row(
+                    paths, row_normalize
+                ),
+                args.repeat,
+            )
+            batch_time, result = best(
+                lambda paths=paths, normalize=normalize: batched(paths, normalize),
+                args.repeat,
+            )
+            assert result == expected, name
+            print(
+                f"{name:<15} {distinct:>8} {row_time * 1000:>13.2f} "
+                f"{batch_time * 1000:>13.2f} {row_time / batch_time:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Compare the nested-loop and index-based joins of ``_cook_characters``.
+
+Usage: python -m benchmarks.characters_join [--cards 100 200 400] [--rewards 40000]
+
+Synthetic FetterCharacterCard/Reward rows are joined on ``rewardId`` the
+way the Genshin characters stage does it, once with the former nested
+loop and once through ``Datasets.index``.
+"""
+
+import argparse
+from pathlib import Path
+import random
+import tempfile
+import time
+from typing import Any
+
+from json_cooker.datasets import Datasets
+
+
+def make_data(cards: int, rewards: int) -> dict[str, Any]:
+    reward_ids = random.sample(range(100_000, 999_999), rewards)
+    reward_rows = [
+        {"rewardId": reward_id, "rewardItemList": [{"itemId": 210_000 + i}]}
+        for i, reward_id in enumerate(reward_ids)
+    ]
+    card_rows = [
+        {
+            "avatarId": 10_000_000 + i,
+            "fetterLevel": 10,
+            "rewardId": random.choice(reward_ids),
+        }
+        for i in range(cards)
+    ]
+    namecards = {
+        str(row["rewardItemList"][0]["itemId"]): {"Icon": "UI"} for row in reward_rows
+    }
+    characters = {str(card["avatarId"]): {} for card in card_rows}
+    return {
+        "rewards": reward_rows,
+        "fetter_character_card": card_rows,
+        "namecards": namecards,
+        "characters": characters,
+    }
+
+
+def nested_loop(data: dict[str, Any]) -> None:
+    for character_card in data["fetter_character_card"]:
+        if character_card["fetterLevel"] != 10:
+            continue
+
+        character_id = character_card["avatarId"]
+        for reward in data["rewards"]:
+            if character_card["rewardId"] == reward["rewardId"]:
+                item_id = reward["rewardItemList"][0]["itemId"]
+                namecard_icon = data["namecards"][str(item_id)]["Icon"]
+                data["characters"][str(character_id)]["NamecardIcon"] = namecard_icon
+
+
+def indexed(data: dict[str, Any]) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        datasets = Datasets(Path(tmp))
+        datasets["rewards"] = data["rewards"]
+        rewards = datasets.index("rewards", "rewardId")
+
+        for character_card in data["fetter_character_card"]:
+            if character_card["fetterLevel"] != 10:
+                continue
+            reward = rewards.get(character_card["rewardId"])
+            if reward is None:
+                continue
+
+            item_id = reward["rewardItemList"][0]["itemId"]
+            namecard_icon = data["namecards"][str(item_id)]["Icon"]
+            data["characters"][str(character_card["avatarId"])]["NamecardIcon"] = (
+                namecard_icon
+            )
+
+
+def timed(func: Any, data: dict[str, Any]) -> float:
+    start = time.perf_counter()
+    func(data)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cards", type=int, nargs="+", default=[100, 200, 400])
+    parser.add_argument("--rewards", type=int, default=40_000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(
+        f"{'Cards':>6} {'Rewards':>8} {'Nested (s)':>11} {'Index (s)':>10} {'Speedup':>8}"
+    )
+    for cards in args.cards:
+        data = make_data(cards, args.rewards)
+        nested = timed(nested_loop, data)
+        index = timed(indexed, data)
+        print(
+            f"{cards:>6} {args.rewards:>8} {nested:>11.3f} {index:>10.4f} "
+            f"{nested / index:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
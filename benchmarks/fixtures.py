@@ -0,0 +1,397 @@
+"""Synthetic raw datasets shaped like the upstream game data.
+
+The excels use random obfuscated key names wherever the cookers have to
+deobfuscate them, and the TextMaps are padded with filler entries so their
+size grows with ``scale`` like the real ones.
+
+Usage: python -m benchmarks.fixtures <directory> [scale]
+"""
+
+from pathlib import Path
+import random
+import string
+import sys
+from typing import Any
+
+import orjson
+
+from json_cooker.genshin import data as genshin_data
+from json_cooker.hsr import data as hsr_data
+from json_cooker.zzz import data as zzz_data
+
+
+def _obfuscated(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_uppercase, k=11))
+
+
+def genshin(scale: int, rng: random.Random) -> dict[str, Any]:
+    k = {
+        name: _obfuscated(rng)
+        for name in (
+            "avatarId",
+            "rewardId",
+            "rewardItemList",
+            "itemId",
+            "id",
+            "nameTextMapHash",
+            "skillIcon",
+            "icon",
+            "talentId",
+        )
+    }
+    hashes: list[int] = []
+
+    def text_hash() -> int:
+        hashes.append(rng.randrange(1, 2**32))
+        return hashes[-1]
+
+    character_count = 10 * scale
+    cards = [
+        {
+            k["avatarId"]: 10000002 + i,
+            k["rewardId"]: 410000 + i,
+            "fetterLevel": 10 if i % 2 == 0 else 9,
+        }
+        for i in range(character_count)
+    ]
+    rewards = [
+        {
+            k["rewardId"]: 400000 + i,
+            k["rewardItemList"]: [{k["itemId"]: 200000 + i, "itemCount": 1}],
+        }
+        for i in range(100 * scale)
+    ]
+    rewards += [
+        {
+            k["rewardId"]: 410000 + i,
+            k["rewardItemList"]: [{k["itemId"]: 210000 + i, "itemCount": 1}],
+        }
+        for i in range(character_count)
+    ]
+    rng.shuffle(rewards)
+    rewards.insert(
+        0,
+        {
+            k["rewardId"]: 999999,
+            k["rewardItemList"]: [{k["itemId"]: 299999, "itemCount": 1}],
+        },
+    )
+
+    talents = [
+        {
+            k["id"]: 10000 + i,
+            k["nameTextMapHash"]: text_hash(),
+            k["skillIcon"]: f"Skill_S_{i}",
+            "cdTime": 1.0,
+        }
+        for i in range(50 * scale)
+    ]
+    # Values the deobfuscator looks for
+    talents.append(
+        {k["id"]: 10024, k["nameTextMapHash"]: 4051912989, k["skillIcon"]: "Skill_A_01"}
+    )
+    hashes.append(4051912989)
+    consts = [
+        {
+            k["talentId"]: 100 + i,
+            k["nameTextMapHash"]: text_hash(),
+            k["icon"]: f"UI_Talent_{i}",
+        }
+        for i in range(30 * scale)
+    ]
+    consts.append(
+        {
+            k["talentId"]: 21,
+            k["nameTextMapHash"]: text_hash(),
+            k["icon"]: "UI_Talent_S_Ayaka_01",
+        }
+    )
+
+    artifacts = [
+        {
+            k["id"]: 70000 + i,
+            "rankLevel": 5,
+            "equipType": "EQUIP_BRACER",
+            k["icon"]: f"UI_RelicIcon_{i}",
+            "setId": 15000 + i % 40,
+            k["nameTextMapHash"]: text_hash(),
+        }
+        for i in range(200 * scale)
+    ]
+    lang_codes = sorted(set(genshin_data.LANGS.values()))
+
+    datasets: dict[str, Any] = {
+        "fetter_character_card": cards,
+        "rewards": rewards,
+        "talents": talents,
+        "consts": consts,
+        "artifacts": artifacts,
+        "artifact_sets": [{"setId": 15000 + i} for i in range(40)],
+        "loc_json": {code: {"FIGHT_PROP_HP": "HP"} for code in lang_codes},
+        "namecards": {
+            str(210000 + i): {"Icon": f"UI_NameCardPic_{i}_P"}
+            for i in range(character_count)
+        },
+        "characters": {
+            str(10000002 + i): {"Element": "Ice"} for i in range(character_count)
+        },
+    }
+    for lang in genshin_data.LANGS:
+        text_map = {str(h): f"{lang} text {h}" for h in hashes}
+        text_map.update(
+            {str(rng.randrange(1, 2**32)): "filler " * 8 for _ in range(2000 * scale)}
+        )
+        datasets[f"text_map_{lang}"] = text_map
+    return datasets
+
+
+def hsr(scale: int, rng: random.Random) -> dict[str, Any]:
+    hashes: list[int] = []
+
+    def text_hash() -> dict[str, int]:
+        hashes.append(rng.randrange(-(2**31), 2**31))
+        return {"Hash": hashes[-1]}
+
+    skills = []
+    for i in range(100 * scale):
+        skill = {
+            "SkillID": 100101 + i,
+            "SkillName": text_hash(),
+            "SkillTag": text_hash(),
+            "SkillIcon": f"SpriteOutput/SkillIcons/{i}.png",
+            "SkillEffect": "SingleAttack",
+        }
+        if i % 2:
+            skill["SkillDesc"] = text_hash()
+        if i % 3:
+            skill["SimpleSkillDesc"] = text_hash()
+        if i % 5:
+            skill["SkillTypeDesc"] = text_hash()
+        skills.append(skill)
+
+    skill_tree = [
+        {
+            "PointID": 1001001 + i,
+            "Level": 1 + i % 2,
+            "LevelUpSkillID": [100101 + i] if i % 2 == 0 else [],
+            "AnchorType": f"Point{i % 18:02}",
+            "IconPath": f"SpriteOutput/AvatarSkillTree/Avatar/{1001 + i % 50}/Icon{i % 7}.png",
+            "PointType": 2,
+            "MaxLevel": 6,
+            "StatusAddList": [
+                {"PropertyType": "HPAddedRatio", "Value": {"Value": 0.04}}
+            ]
+            if i % 3 == 0
+            else [],
+        }
+        for i in range(200 * scale)
+    ]
+    lang_codes = sorted(set(hsr_data.LANGS.values()))
+
+    datasets: dict[str, Any] = {
+        "skill": skills,
+        "skill_tree": skill_tree,
+        "skill_tree_ld": [
+            {**point, "PointID": point["PointID"] + 9000000}
+            for point in skill_tree[: 20 * scale]
+        ],
+        "property_config": [
+            {"PropertyType": "HPAddedRatio", "IconPath": "IconMaxHP.png"}
+        ],
+        "relic_set_config": [
+            {
+                "SetID": 101 + i,
+                "SetName": text_hash(),
+                "SetIconPath": f"SpriteOutput/ItemIcon/71000{i}.png",
+                "SetSkillList": [2, 4],
+            }
+            for i in range(40)
+        ],
+        "hsr_json": {code: {"1": "a"} for code in lang_codes},
+        "old_hsr_json": {code: {"2": "b"} for code in lang_codes},
+    }
+    for lang in hsr_data.LANGS:
+        text_map = {str(h): f"{lang} text {h}" for h in hashes}
+        text_map.update(
+            {
+                str(rng.randrange(-(2**31), 2**31)): "filler " * 8
+                for _ in range(2000 * scale)
+            }
+        )
+        datasets[f"text_map_{lang}"] = text_map
+    return datasets
+
+
+def zzz(scale: int, rng: random.Random) -> dict[str, Any]:
+    k = {
+        name: _obfuscated(rng)
+        for name in (
+            "Items",
+            "Rarity",
+            "Level",
+            "EnhanceRate",
+            "Exp",
+            "ExpRecycleRate",
+            "Star",
+            "ItemID",
+            "ID",
+            "AvatarID",
+            "SkillMaterials",
+            "BreakLevel",
+            "StarRate",
+            "RandRate",
+            "TitleID",
+            "TitleText",
+            "TitleAsset",
+            "CallingCardID",
+            "Icon",
+            "Name",
+        )
+    }
+
+    def table(rows: list[dict[str, Any]]) -> dict[str, Any]:
+        return {k["Items"]: rows}
+
+    card_dir = "Assets/NapResources/UI/Sprite/A1DynamicLoad/FriendCard/UnPacker"
+    title_dir = "Assets/NapResources/UI/Materials/General"
+    return {
+        "equipment_level": table(
+            [{k["Rarity"]: 2, k["Level"]: 0}, {k["Rarity"]: 3, k["Level"]: 1}]
+            + [{k["Rarity"]: 4, k["Level"]: i} for i in range(2, 16 * scale)]
+        ),
+        "weapon_level": table(
+            [
+                {k["ExpRecycleRate"]: 10000, k["EnhanceRate"]: 0, k["Exp"]: 0},
+                {k["ExpRecycleRate"]: 9000, k["EnhanceRate"]: 1568, k["Exp"]: 60},
+            ]
+            + [
+                {k["ExpRecycleRate"]: 1, k["EnhanceRate"]: i, k["Exp"]: i}
+                for i in range(60 * scale)
+            ]
+        ),
+        "weapon_star": table(
+            [
+                {k["StarRate"]: 0, k["RandRate"]: 0},
+                {k["StarRate"]: 8922, k["RandRate"]: 3000},
+            ]
+        ),
+        "buddy_star": table([{k["Star"]: 1}, {k["Star"]: 2}]),
+        "equipment": table(
+            [{k["ItemID"]: 31000 + i} for i in range(50 * scale)]
+            + [{k["ItemID"]: 31021}]
+        ),
+        "avatar_skill_level": table(
+            [
+                {
+                    k["ID"]: 1011001,
+                    k["AvatarID"]: 1011,
+                    k["SkillMaterials"]: [{k["ItemID"]: 10, "Num": 1}],
+                }
+            ]
+        ),
+        "buddy_level_advance": table(
+            [{k["BreakLevel"]: 0}, {k["BreakLevel"]: 1}, {k["BreakLevel"]: 2}]
+        ),
+        "title_config": table(
+            [
+                {
+                    k["TitleID"]: 3800100 + i,
+                    k["TitleText"]: f"TitleText_{i}",
+                    k["TitleAsset"]: f"{title_dir}/UI_Title_Default.mat"
+                    if i == 0
+                    else f"{title_dir}/UI_Title_Brilliant.mat",
+                }
+                for i in range(20 * scale)
+            ]
+        ),
+        "namecards": table(
+            [
+                {
+                    k["CallingCardID"]: 3300001 + i,
+                    k["Icon"]: f"{card_dir}/ImgCardCommon01.png"
+                    if i == 0
+                    else f"{card_dir}/ImgCard{i}.png",
+                }
+                for i in range(20 * scale)
+            ]
+        ),
+        "equipment_suit": table(
+            [
+                {"ID": 31000 + i, k["Name"]: f"EquipmentSuit_{i}_name"}
+                for i in range(20 * scale)
+            ]
+        ),
+    }
+
+
+GAMES = {"genshin": genshin, "hsr": hsr, "zzz": zzz}
+
+# Where each cooker downloads its datasets from
+URLS: dict[str, dict[str, str]] = {
+    "genshin": {
+        "loc_json": genshin_data.LOC_JSON,
+        "artifacts": genshin_data.ARTIFACTS,
+        "artifact_sets": genshin_data.ARTIFACT_SETS,
+        "talents": genshin_data.TALENTS,
+        "consts": genshin_data.CONSTS,
+        "rewards": genshin_data.REWARD_EXCEL,
+        "fetter_character_card": genshin_data.FETTER_CHARACTER_CARD_EXCEL,
+        "namecards": genshin_data.NAMECARDS,
+        "characters": genshin_data.CHARACTERS,
+        **{
+            f"text_map_{lang}": genshin_data.TEXT_MAP.format(lang=lang)
+            for lang in genshin_data.LANGS
+        },
+    },
+    "hsr": {
+        "skill": hsr_data.SKILL,
+        "skill_tree": hsr_data.SKILL_TREE,
+        "skill_tree_ld": hsr_data.SKILL_TREE_LD,
+        "property_config": hsr_data.PROPERTY_CONFIG,
+        "hsr_json": hsr_data.HSR_JSON,
+        "old_hsr_json": hsr_data.OLD_HSR_JSON,
+        "relic_set_config": hsr_data.RELIC_SET_CONFIG,
+        **{
+            f"text_map_{lang}": hsr_data.TEXT_MAP.format(lang=lang)
+            for lang in hsr_data.LANGS
+        },
+    },
+    "zzz": {
+        "equipment_level": zzz_data.EQUIPMENT_LEVEL,
+        "equipment_suit": zzz_data.EQUIPMENT_SUIT,
+        "equipment": zzz_data.EQUIPMENT,
+        "weapon_level": zzz_data.WEAPON_LEVEL,
+        "weapon_star": zzz_data.WEAPON_STAR,
+        "buddy_star": zzz_data.BUDDY_STAR,
+        "buddy_level_advance": zzz_data.BUDDY_LEVEL_ADVANCE,
+        "avatar_skill_level": zzz_data.AVATAR_SKILL_LEVEL,
+        "title_config": zzz_data.TITLE_CONFIG,
+        "namecards": zzz_data.CALLING_CARD_CONFIG,
+    },
+}
+
+
+def generate(scale: int = 1, seed: int = 0) -> dict[str, dict[str, bytes]]:
+    """Return the raw bytes of every dataset, keyed by game then dataset name."""
+    return {
+        game: {
+            name: orjson.dumps(value)
+            for name, value in make(scale, random.Random(seed)).items()
+        }
+        for game, make in GAMES.items()
+    }
+
+
+def write(root: Path, scale: int = 1, seed: int = 0) -> None:
+    """Write the datasets as a raw cache under ``root``, ready for --no-download."""
+    for game, datasets in generate(scale, seed).items():
+        directory = root / "raw_data" / game
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, raw in datasets.items():
+            (directory / f"{name}.json").write_bytes(raw)
+    for sub in ("data", "data/hsr", "data/zzz"):
+        (root / sub).mkdir(parents=True, exist_ok=True)
+
+
+if __name__ == "__main__":
+    write(Path(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else 1)
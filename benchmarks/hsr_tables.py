@@ -0,0 +1,173 @@
+"""Compare the dict-row and column-table paths of the HSR skill stages.
+
+Usage: python -m benchmarks.hsr_tables [--source raw_data/hsr] [--scale 40] [--repeat 5]
+
+The skill, skill tree and skill tree LD excels are read from the raw cache
+of a previous run if ``--source`` is given, otherwise synthetic ones are
+generated at ``--scale`` (40 is about the size of the real excels). Each
+path parses the raw bytes, keeps what it needs, then runs the skill and
+skill tree cook bodies.
+"""
+
+import argparse
+from collections import defaultdict
+from collections.abc import Callable
+from pathlib import Path
+import random
+import re
+import time
+import tracemalloc
+from typing import Any
+
+import orjson
+
+from benchmarks import fixtures
+from json_cooker.compression import read_raw
+from json_cooker.hsr.cooker import (
+    SKILL_FIELDS,
+    SKILL_LEVEL_UP_FIELDS,
+    SKILL_TEXT_FIELDS,
+    SKILL_TREE_FIELDS,
+    cook_skill,
+    cook_skill_tree,
+)
+from json_cooker.table import projection
+
+DATASETS = ("skill", "skill_tree", "skill_tree_ld")
+
+
+def load_sources(source: Path | None, scale: int) -> dict[str, bytes]:
+    if source is not None:
+        return {name: read_raw(next(source.glob(f"{name}.json*"))) for name in DATASETS}
+    data = fixtures.hsr(scale, random.Random(0))
+    return {name: orjson.dumps(data[name]) for name in DATASETS}
+
+
+def dict_cook_skill(
+    skill_tree: list[dict[str, Any]], skill: list[dict[str, Any]]
+) -> dict[str, dict[str, Any]]:
+    data: dict[str, dict[str, Any]] = {}
+    level_ups: dict[int, list[int]] = defaultdict(list)
+
+    for point in skill_tree:
+        if point["Level"] != 1:
+            continue
+        for skill_id in point["LevelUpSkillID"]:
+            level_ups[skill_id].append(point["PointID"])
+
+    for s in skill:
+        skill_id = str(s["SkillID"])
+        data[skill_id] = {
+            "name": s["SkillName"]["Hash"],
+            "desc": s["SkillDesc"]["Hash"] if "SkillDesc" in s else "",
+            "simple_desc": s["SimpleSkillDesc"]["Hash"]
+            if "SimpleSkillDesc" in s
+            else "",
+            "icon": s["SkillIcon"],
+            "tag": s["SkillTag"]["Hash"],
+            "type_desc": s["SkillTypeDesc"]["Hash"] if "SkillTypeDesc" in s else "",
+            "effect": s["SkillEffect"],
+        }
+        for point_id in level_ups.get(s["SkillID"], []):
+            data[str(point_id)] = data[skill_id]
+
+    return data
+
+
+def dict_cook_skill_tree(
+    skill_tree: list[dict[str, Any]], skill_tree_ld: list[dict[str, Any]]
+) -> dict[str, dict[str, Any]]:
+    data: dict[str, dict[str, Any]] = {}
+
+    for skill in skill_tree + skill_tree_ld:
+        new_skill_data = data[str(skill["PointID"])] = {}
+        new_skill_data["anchor"] = skill["AnchorType"]
+        new_skill_data["icon"] = re.sub(r"Avatar/(\d+)/", "", skill["IconPath"])
+        new_skill_data["pointType"] = skill["PointType"]
+        new_skill_data["maxLevel"] = skill["MaxLevel"]
+        if skill["StatusAddList"]:
+            stat = skill["StatusAddList"][0]
+            new_skill_data["addStatus"] = {
+                "type": stat["PropertyType"],
+                "value": stat["Value"]["Value"],
+            }
+        new_skill_data["skillIds"] = skill["LevelUpSkillID"]
+
+    return data
+
+
+def load_dicts(raws: dict[str, bytes]) -> dict[str, Any]:
+    return {name: orjson.loads(raw) for name, raw in raws.items()}
+
+
+def load_tables(raws: dict[str, bytes]) -> dict[str, Any]:
+    # The union of the fields the HSR stages declare for each excel
+    fields = {
+        "skill": {*SKILL_FIELDS, *SKILL_TEXT_FIELDS},
+        "skill_tree": {*SKILL_LEVEL_UP_FIELDS, *SKILL_TREE_FIELDS},
+        "skill_tree_ld": set(SKILL_TREE_FIELDS),
+    }
+    return {
+        name: projection(fields[name])(orjson.loads(raw)) for name, raw in raws.items()
+    }
+
+
+def cook_dicts(data: dict[str, Any]) -> None:
+    dict_cook_skill(data["skill_tree"], data["skill"])
+    dict_cook_skill_tree(data["skill_tree"], data["skill_tree_ld"])
+
+
+def cook_tables(data: dict[str, Any]) -> None:
+    cook_skill(data["skill_tree"], data["skill"])
+    cook_skill_tree(data["skill_tree"], data["skill_tree_ld"])
+
+
+def measure(
+    load: Callable[[dict[str, bytes]], dict[str, Any]],
+    cook: Callable[[dict[str, Any]], None],
+    raws: dict[str, bytes],
+    repeat: int,
+) -> tuple[float, float, int]:
+    """Best load and cook times, and the memory held by the loaded datasets."""
+    load_time = cook_time = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = load(raws)
+        load_time = min(load_time, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        cook(data)
+        cook_time = min(cook_time, time.perf_counter() - start)
+
+    tracemalloc.start()
+    data = load(raws)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return load_time, cook_time, retained
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--source", type=Path)
+    parser.add_argument("--scale", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    raws = load_sources(args.source, args.scale)
+    rows = {name: len(orjson.loads(raw)) for name, raw in raws.items()}
+    print(", ".join(f"{name}: {count} rows" for name, count in rows.items()))
+
+    print(f"{'Path':<8} {'Load (ms)':>10} {'Cook (ms)':>10} {'Memory (MB)':>12}")
+    for path, load, cook in (
+        ("dicts", load_dicts, cook_dicts),
+        ("tables", load_tables, cook_tables),
+    ):
+        load_time, cook_time, retained = measure(load, cook, raws, args.repeat)
+        print(
+            f"{path:<8} {load_time * 1000:>10.1f} {cook_time * 1000:>10.1f} "
+            f"{retained / 2**20:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
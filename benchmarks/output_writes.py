@@ -0,0 +1,79 @@
+"""Compare writing cooked outputs through aiofiles and through one thread call.
+
+Usage: python -m benchmarks.output_writes [--source data] [--repeat 5]
+
+Every JSON file of the source directory is parsed, then written back into a
+temporary directory the way ``_save_data`` used to (serialize in a thread,
+decode, write text through aiofiles) and the way it does now (serialize
+and write bytes in a single ``asyncio.to_thread`` call).
+
+aiofiles is only a dev dependency, install it with ``uv sync --group dev``.
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+import tempfile
+import time
+from typing import Any
+
+import aiofiles
+import orjson
+
+OPTION = orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+
+
+async def write_aiofiles(path: Path, data: Any) -> None:
+    async with aiofiles.open(path, "w", encoding="utf-8") as f:
+        bytes_ = await asyncio.to_thread(orjson.dumps, data, option=OPTION)
+        await f.write(bytes_.decode())
+
+
+def _write_bytes(path: Path, data: Any) -> None:
+    path.write_bytes(orjson.dumps(data, option=OPTION))
+
+
+async def write_thread(path: Path, data: Any) -> None:
+    await asyncio.to_thread(_write_bytes, path, data)
+
+
+async def bench(
+    write: Any, outputs: dict[str, Any], directory: Path, repeat: int
+) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i, data in enumerate(outputs.values()):
+            await write(directory / f"{i}.json", data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--source", type=Path, default=Path("data"))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    outputs = {
+        path.as_posix(): orjson.loads(path.read_bytes())
+        for path in sorted(args.source.rglob("*.json"))
+        if not path.name.endswith(".min.json") and path.stat().st_size
+    }
+    if not outputs:
+        parser.error(f"No outputs found in {args.source}")
+    print(f"{len(outputs)} outputs from {args.source}\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        aiofiles_time = await bench(write_aiofiles, outputs, directory, args.repeat)
+        thread_time = await bench(write_thread, outputs, directory, args.repeat)
+
+    print(f"{'Backend':<12} {'Time (s)':>9}")
+    print(f"{'aiofiles':<12} {aiofiles_time:>9.3f}")
+    print(f"{'to_thread':<12} {thread_time:>9.3f}")
+    print(f"\nSpeedup: {aiofiles_time / thread_time:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,240 @@
+"""Benchmark the cook pipeline offline with synthetic fixtures.
+
+Usage: python -m benchmarks.pipeline [--scale 10] [--rounds 2] [--report path.json]
+
+The fixtures are served by a local aiohttp stand-in for the upstream hosts,
+which the cookers reach through the scheduler's URL rewrite hook. The first
+round starts from an empty raw cache, the following ones revalidate it
+with ETags like the daily run does. Every round times download() and
+dump() of each cooker, and the per-stage timings come from the profiler.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import os
+from pathlib import Path
+import tempfile
+import time
+from typing import Any
+
+import aiohttp
+from aiohttp import web
+import orjson
+
+from benchmarks.fixtures import URLS, generate
+from json_cooker import profiling
+from json_cooker.base import DownloadScheduler, JSONCooker
+from json_cooker.datasets import Datasets
+from json_cooker.executor import EXECUTOR_KINDS, CPUExecutor
+from json_cooker.genshin.cooker import GenshinJSONCooker
+from json_cooker.hsr.cooker import HSRJSONCooker
+from json_cooker.text_map import TextMapStreamFilter, filter_text_map
+from json_cooker.zzz.cooker import ZZZJSONCooker
+
+COOKERS: dict[str, type[JSONCooker]] = {
+    "genshin": GenshinJSONCooker,
+    "hsr": HSRJSONCooker,
+    "zzz": ZZZJSONCooker,
+}
+
+
+def _strip_scheme(url: str) -> str:
+    return url.split("://", 1)[1]
+
+
+class FixtureServer:
+    """Serves the fixtures under their upstream URLs, with ETag revalidation."""
+
+    def __init__(self, files: dict[str, bytes], latency: float = 0.0) -> None:
+        self._files = {_strip_scheme(url): raw for url, raw in files.items()}
+        self._etags = {
+            path: f'"{hashlib.sha256(raw).hexdigest()}"'
+            for path, raw in self._files.items()
+        }
+        self._latency = latency
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+        self.requests = 0
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        if self._latency:
+            await asyncio.sleep(self._latency)
+
+        path = request.match_info["path"]
+        if path not in self._files:
+            raise web.HTTPNotFound
+        etag = self._etags[path]
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=self._files[path], headers={"ETag": etag})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def rewrite_url(self, url: str) -> str:
+        return f"{self.base_url}/{_strip_scheme(url)}"
+
+
+async def run_round(
+    games: list[str],
+    server: FixtureServer,
+    executor: CPUExecutor,
+    args: argparse.Namespace,
+    round_: int,
+) -> dict[str, dict[str, float]]:
+    timings: dict[str, dict[str, float]] = {}
+    connector = DownloadScheduler.create_connector()
+    async with aiohttp.ClientSession(connector=connector) as session:
+        scheduler = DownloadScheduler(session, rewrite_url=server.rewrite_url)
+        for game in games:
+            profiling.set_scope(f"{game}/{round_}")
+            cooker = COOKERS[game](
+                session, scheduler=scheduler, jobs=args.jobs, executor=executor
+            )
+            start = time.perf_counter()
+            await cooker.download()
+            download = time.perf_counter() - start
+            await cooker.dump()
+            total = time.perf_counter() - start
+            timings[game] = {
+                "download": download,
+                "dump": total - download,
+                "total": total,
+            }
+    return timings
+
+
+def check_raw_cache(games: list[str]) -> None:
+    """Check that the raw cache left by the rounds scans back into usable datasets."""
+    for game in games:
+        datasets = Datasets(Path("raw_data") / game)
+        datasets.scan()
+        names = list(datasets)
+        assert names, f"No raw datasets cached for {game}"
+        assert len(datasets) == len(names) == len(set(names))
+        assert all(name in datasets for name in names)
+
+
+def check_text_map_stream(datasets: dict[str, dict[str, bytes]]) -> None:
+    """Check that the streamed TextMap filter matches a full parse, fed byte by byte.
+
+    Feeding single bytes splits every token across chunks. The fixtures are
+    cut down to their first members so this stays quick at any scale.
+    """
+    text_maps: list[bytes] = [b"{}", b" {\n}\n", b'{"1": "a", "2\\"": "\\u00e9"}']
+    for game in datasets.values():
+        raw = next((r for n, r in game.items() if n.startswith("text_map_")), None)
+        if raw is None:
+            continue
+        head = dict(itertools.islice(orjson.loads(raw).items(), 500))
+        text_maps.append(orjson.dumps(head))
+        text_maps.append(orjson.dumps(head, option=orjson.OPT_INDENT_2))
+
+    for raw in text_maps:
+        text_map = orjson.loads(raw)
+        hashes = set(list(text_map)[::2])
+        stream_filter = TextMapStreamFilter(hashes)
+        for i in range(len(raw)):
+            stream_filter.feed(raw[i : i + 1])
+        assert stream_filter.close() == filter_text_map(text_map, hashes), raw[:50]
+
+
+def print_stages(profiler: profiling.Profiler, round_: int) -> None:
+    print(f"\nStages of round {round_}")
+    print(f"{'Stage':<45} {'Wall':>9} {'Max RSS (MB)':>13}")
+    for record in sorted(profiler.records, key=lambda r: r["start"]):
+        if record["kind"] == "stage" and record["scope"].endswith(f"/{round_}"):
+            print(
+                f"{record['name']:<45} {record['wall']:>8.3f}s "
+                f"{(record.get('max_rss') or 0) / 1e6:>13.1f}"
+            )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument(
+        "--games", nargs="+", choices=list(COOKERS), default=list(COOKERS)
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds per request."
+    )
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--executor", choices=EXECUTOR_KINDS, default="thread")
+    parser.add_argument("--tracemalloc", action="store_true")
+    parser.add_argument("--report", type=Path, default=None)
+    args = parser.parse_args()
+    report = args.report.resolve() if args.report is not None else None
+
+    start = time.perf_counter()
+    datasets = generate(args.scale)
+    files = {
+        URLS[game][name]: raw
+        for game in args.games
+        for name, raw in datasets[game].items()
+    }
+    size = sum(len(raw) for raw in files.values())
+    check_text_map_stream({game: datasets[game] for game in args.games})
+    print(
+        f"Generated {len(files)} fixtures, {size / 1e6:.1f} MB, "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+    server = FixtureServer(files, args.latency)
+    await server.start()
+    executor = CPUExecutor(args.executor)
+    profiler = profiling.enable(trace_malloc=args.tracemalloc)
+
+    cwd = Path.cwd()
+    rounds: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # The cookers read and write raw_data/ and data/ relative to the cwd
+        os.chdir(tmp)
+        for sub in ("data", "data/hsr", "data/zzz"):
+            Path(sub).mkdir(parents=True)
+        try:
+            for round_ in range(1, args.rounds + 1):
+                requests = server.requests
+                timings = await run_round(args.games, server, executor, args, round_)
+                rounds.append(
+                    {"timings": timings, "requests": server.requests - requests}
+                )
+            check_raw_cache(args.games)
+        finally:
+            os.chdir(cwd)
+            executor.shutdown()
+            await server.stop()
+
+    print(f"\n{'Round':<6} {'Game':<10} {'Download':>10} {'Dump':>10} {'Total':>10}")
+    for round_, result in enumerate(rounds, 1):
+        for game, timing in result["timings"].items():
+            print(
+                f"{round_:<6} {game:<10} {timing['download']:>9.2f}s "
+                f"{timing['dump']:>9.2f}s {timing['total']:>9.2f}s"
+            )
+    print_stages(profiler, len(rounds))
+    print()
+    print(profiler.format_summary())
+
+    if report is not None:
+        profiler.save(report)
+        print(f"\nProfile report written to {report}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""Compare disk size and load time of the raw cache formats.
+
+Usage: python -m benchmarks.raw_cache [--source raw_data] [--repeat 3]
+
+The source directory is the raw cache of a previous run (any format),
+every file is re-encoded in each format into a temporary directory.
+"""
+
+import argparse
+from pathlib import Path
+import tempfile
+import time
+
+import orjson
+
+from json_cooker.compression import (
+    compress,
+    parse_raw_path,
+    raw_path,
+    read_raw,
+    zstandard,
+)
+
+FORMATS: list[tuple[str, int | None]] = [
+    ("none", None),
+    ("gzip", 1),
+    ("gzip", 6),
+    ("gzip", 9),
+]
+if zstandard is not None:
+    FORMATS += [("zstd", 3), ("zstd", 10), ("zstd", 19)]
+
+
+def load_sources(source: Path) -> dict[str, bytes]:
+    raws: dict[str, bytes] = {}
+    for path in sorted(source.rglob("*.json*")):
+        parsed = parse_raw_path(path)
+        if parsed is None or path.parent == source:
+            continue
+        raws[f"{path.parent.name}/{parsed[0]}"] = read_raw(path)
+    return raws
+
+
+def bench(
+    raws: dict[str, bytes], compression: str, level: int | None, repeat: int
+) -> tuple[float, int, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        paths: list[Path] = []
+
+        start = time.perf_counter()
+        for key, raw in raws.items():
+            path = raw_path(directory, key.replace("/", "__"), compression)
+            path.write_bytes(compress(raw, compression, level))
+            paths.append(path)
+        write_time = time.perf_counter() - start
+
+        size = sum(path.stat().st_size for path in paths)
+
+        load_time = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for path in paths:
+                orjson.loads(read_raw(path))
+            load_time = min(load_time, time.perf_counter() - start)
+
+    return write_time, size, load_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--source", type=Path, default=Path("raw_data"))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    raws = load_sources(args.source)
+    if not raws:
+        parser.error(f"No raw files found in {args.source}")
+    total = sum(len(raw) for raw in raws.values())
+    print(f"{len(raws)} raw files, {total / 1e6:.1f} MB uncompressed\n")
+
+    print(
+        f"{'Format':<12} {'Size (MB)':>10} {'Ratio':>7} {'Write (s)':>10} {'Load (s)':>9}"
+    )
+    for compression, level in FORMATS:
+        write_time, size, load_time = bench(raws, compression, level, args.repeat)
+        label = compression if level is None else f"{compression}-{level}"
+        print(
+            f"{label:<12} {size / 1e6:>10.2f} {total / size:>6.1f}x "
+            f"{write_time:>10.2f} {load_time:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
 import asyncio
 import logging
 import argparse
+from pathlib import Path
 import sys
+import time
 
 import aiohttp
 
+from json_cooker.base import DownloadScheduler, JSONCooker
+from json_cooker import profiling
+from json_cooker.executor import EXECUTOR_KINDS, CPUExecutor
 from json_cooker.genshin.cooker import GenshinJSONCooker
 from json_cooker.hsr.cooker import HSRJSONCooker
 from json_cooker.zzz.cooker import ZZZJSONCooker
@@ -42,6 +47,90 @@ arg_parser.add_argument(
     help="Skip downloading, load from raw cache and only run dump.",
     default=False,
 )
+arg_parser.add_argument(
+    "--jobs",
+    type=int,
+    help="Number of worker processes used to filter TextMaps.",
+    default=1,
+)
+arg_parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Skip cooking stages whose raw inputs are unchanged since the last run.",
+    default=False,
+)
+arg_parser.add_argument(
+    "--concurrency",
+    type=int,
+    help="Maximum number of concurrent downloads across all games.",
+    default=8,
+)
+arg_parser.add_argument(
+    "--per-host",
+    type=int,
+    help="Maximum number of connections per host.",
+    default=4,
+)
+arg_parser.add_argument(
+    "--retries",
+    type=int,
+    help="Number of retries for transient download failures.",
+    default=4,
+)
+arg_parser.add_argument(
+    "--timeout",
+    type=float,
+    help="Seconds to wait for a connection or the next chunk of a download.",
+    default=60,
+)
+arg_parser.add_argument(
+    "--raw-compression",
+    choices=["none", "gzip", "zstd"],
+    help="Compression of the raw cache files written to raw_data/, zstd needs the zstd extra.",
+    default="none",
+)
+arg_parser.add_argument(
+    "--raw-compression-level",
+    type=int,
+    help="Compression level of the raw cache, defaults to a per-format level.",
+    default=None,
+)
+arg_parser.add_argument(
+    "--output-format",
+    dest="output_formats",
+    action="append",
+    choices=["compact", "gzip", "zstd"],
+    help=(
+        "Also write cooked files as minified JSON (.min.json) or precompressed "
+        "(.json.gz/.json.zst), can be repeated. The indented JSON is always written. "
+        "zstd needs the zstd extra."
+    ),
+    default=[],
+)
+arg_parser.add_argument(
+    "--executor",
+    choices=EXECUTOR_KINDS,
+    help="Run cooking and serialization in worker threads or processes.",
+    default="thread",
+)
+arg_parser.add_argument(
+    "--cpu-workers",
+    type=int,
+    help="Number of CPU workers, also the number of stages cooked at once per game.",
+    default=None,
+)
+arg_parser.add_argument(
+    "--profile-report",
+    type=Path,
+    help="Write the time, bytes and memory of every download, load and stage to a JSON file.",
+    default=None,
+)
+arg_parser.add_argument(
+    "--profile-tracemalloc",
+    action="store_true",
+    help="Also trace Python allocations per step, slows the run down noticeably.",
+    default=False,
+)
 args = arg_parser.parse_args()
 
 
@@ -59,32 +148,92 @@ async def main() -> None:
     logging.basicConfig(level=logging.INFO, handlers=[handler])
 
     session: aiohttp.ClientSession | None = None
+    scheduler: DownloadScheduler | None = None
+    timings: dict[str, dict[str, float]] = {}
+    executor = CPUExecutor(args.executor, args.cpu_workers)
+    profiler = profiling.enable(trace_malloc=args.profile_tracemalloc)
 
-    async def run(cooker_cls: type) -> None:
-        cooker = cooker_cls(session)
-        if args.no_download:
-            await cooker.dump()
-        elif args.no_dump:
+    async def run(cooker_cls: type[JSONCooker]) -> None:
+        cooker = cooker_cls(
+            session,
+            scheduler=scheduler,
+            jobs=args.jobs,
+            incremental=args.incremental,
+            raw_compression=args.raw_compression,
+            raw_compression_level=args.raw_compression_level,
+            output_formats=args.output_formats,
+            executor=executor,
+        )
+        timing = timings[cooker_cls.__name__] = {}
+        profiling.set_scope(cooker_cls._game)
+
+        start = time.perf_counter()
+        if not args.no_download:
             await cooker.download()
-        else:
-            await cooker.cook()
+            timing["download"] = time.perf_counter() - start
+        if not args.no_dump:
+            dump_start = time.perf_counter()
+            await cooker.dump()
+            timing["dump"] = time.perf_counter() - dump_start
+        timing["total"] = time.perf_counter() - start
 
+    cooker_classes = [
+        cooker_cls
+        for enabled, cooker_cls in (
+            (args.gi, GenshinJSONCooker),
+            (args.hsr, HSRJSONCooker),
+            (args.zzz, ZZZJSONCooker),
+        )
+        if enabled
+    ]
+
+    start = time.perf_counter()
     if args.no_download:
-        if args.gi:
-            await run(GenshinJSONCooker)
-        if args.hsr:
-            await run(HSRJSONCooker)
-        if args.zzz:
-            await run(ZZZJSONCooker)
+        results = await asyncio.gather(
+            *[run(cooker_cls) for cooker_cls in cooker_classes], return_exceptions=True
+        )
     else:
-        async with aiohttp.ClientSession() as s:
+        connector = DownloadScheduler.create_connector(
+            limit=args.concurrency, limit_per_host=args.per_host
+        )
+        async with aiohttp.ClientSession(connector=connector) as s:
             session = s
-            if args.gi:
-                await run(GenshinJSONCooker)
-            if args.hsr:
-                await run(HSRJSONCooker)
-            if args.zzz:
-                await run(ZZZJSONCooker)
+            scheduler = DownloadScheduler(
+                s,
+                concurrency=args.concurrency,
+                max_retries=args.retries,
+                timeout=aiohttp.ClientTimeout(
+                    total=None, sock_connect=args.timeout, sock_read=args.timeout
+                ),
+            )
+            results = await asyncio.gather(
+                *[run(cooker_cls) for cooker_cls in cooker_classes],
+                return_exceptions=True,
+            )
+    executor.shutdown()
+    elapsed = time.perf_counter() - start
+
+    print(f"{'Game':<20} {'Download':>10} {'Dump':>10} {'Total':>10}  Status")
+    for cooker_cls, result in zip(cooker_classes, results):
+        timing = timings[cooker_cls.__name__]
+        columns = [
+            f"{timing[key]:>9.2f}s" if key in timing else f"{'-':>10}"
+            for key in ("download", "dump", "total")
+        ]
+        status = "OK" if result is None else f"FAILED ({result!r})"
+        print(f"{cooker_cls.__name__:<20} {' '.join(columns)}  {status}")
+    print(f"Wall time: {elapsed:.2f}s")
+    print()
+    print(profiler.format_summary())
+    if args.profile_report is not None:
+        profiler.save(args.profile_report)
+        print(f"Profile report written to {args.profile_report}")
+
+    failures = [result for result in results if isinstance(result, BaseException)]
+    for failure in failures:
+        logging.error("Cooking failed", exc_info=failure)
+    if failures:
+        sys.exit(1)
 
 
 asyncio.run(main())
@@ -0,0 +1,35 @@
+from collections.abc import Callable, Iterable
+import re
+
+# The per-character folder of HSR skill tree icons, dropped from the output
+_AVATAR_DIR = re.compile(r"Avatar/\d+/")
+# Joins a batch for a single regex pass, never part of a path
+_SEPARATOR = "\0"
+
+Normalizer = Callable[[list[str]], list[str]]
+
+
+def strip_avatar_dirs(paths: list[str]) -> list[str]:
+    """Drop the ``Avatar/<id>/`` folder of HSR skill tree icons."""
+    if not paths:
+        return []
+    return _AVATAR_DIR.sub("", _SEPARATOR.join(paths)).split(_SEPARATOR)
+
+
+def zzz_ui_icons(paths: list[str]) -> list[str]:
+    """``Assets/.../ImgCardCommon01.png`` -> ``/ui/zzz/ImgCardCommon01.png``."""
+    return [f"/ui/zzz/{path.rpartition('/')[2]}" for path in paths]
+
+
+def asset_suffixes(paths: list[str]) -> list[str]:
+    """``Assets/.../UI_Title_Default.mat`` -> ``Default``, the variant of an asset."""
+    return [path.rpartition("_")[2].partition(".")[0] for path in paths]
+
+
+def normalize_paths(paths: Iterable[str], normalize: Normalizer) -> dict[str, str]:
+    """Normalize each distinct path of ``paths`` once, keyed by the raw path.
+
+    Many rows share the same asset, so a column is deduplicated first.
+    """
+    unique = list(dict.fromkeys(paths))
+    return dict(zip(unique, normalize(unique), strict=True))
@@ -1,19 +1,194 @@
+from abc import ABC, abstractmethod
 import asyncio
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+import hashlib
 import logging
 from pathlib import Path
-from typing import Any
+import random
+from typing import Any, TypeVar
 
-import aiofiles
 import aiohttp
 import orjson
 
+from .compression import (
+    READ_ERRORS,
+    SUFFIXES,
+    check_available,
+    compress,
+    raw_path,
+)
+from .datasets import Datasets
+from .executor import CPUExecutor
+from .http_cache import HTTPCache
+from .incremental import CookState
+from .manifest import OutputManifest, write_atomic, write_if_changed
+from .output import OUTPUT_FORMATS, encode_outputs, get_output_formats
+from .profiling import add_bytes
+from .table import projection
+from .text_map import (
+    TextMapStreamFilter,
+    build_text_map_bundle,
+    filter_text_map,
+    load_and_filter_text_map,
+)
+from .utils import instrumented, stage_fields, stage_inputs
+
 LOGGER_ = logging.getLogger(__name__)
 
+Stage = Callable[[], Awaitable[None]]
+T = TypeVar("T")
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_stage_outputs: ContextVar[list[str] | None] = ContextVar(
+    "_stage_outputs", default=None
+)
+
 
-class JSONCooker:
-    def __init__(self, session: aiohttp.ClientSession | None) -> None:
+class RetryableStatusError(Exception):
+    def __init__(self, status: int, retry_after: float | None) -> None:
+        super().__init__(f"Transient HTTP status {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class DownloadScheduler:
+    """Runs HTTP requests with bounded concurrency, timeouts and retries."""
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        *,
+        concurrency: int = 8,
+        max_retries: int = 4,
+        backoff: float = 1.0,
+        max_delay: float = 60.0,
+        timeout: aiohttp.ClientTimeout | None = None,
+        rewrite_url: Callable[[str], str] | None = None,
+    ) -> None:
         self._session = session
-        self._data: dict[str, Any] = {}
+        # Lets benchmarks and mirrors serve the upstream URLs from elsewhere
+        self._rewrite_url = rewrite_url
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._max_delay = max_delay
+        # No total timeout, TextMaps can legitimately take minutes to download
+        self._timeout = timeout or aiohttp.ClientTimeout(
+            total=None, sock_connect=30, sock_read=60
+        )
+
+    @staticmethod
+    def create_connector(
+        *, limit: int = 32, limit_per_host: int = 4
+    ) -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(
+            limit=limit, limit_per_host=limit_per_host, ttl_dns_cache=300
+        )
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        # A Retry-After beyond the cap is not worth stalling the run for,
+        # fall back to our own backoff
+        if (
+            isinstance(error, RetryableStatusError)
+            and error.retry_after is not None
+            and error.retry_after <= self._max_delay
+        ):
+            return error.retry_after
+        delay = self._backoff * 2**attempt + random.uniform(0, self._backoff)
+        return min(delay, self._max_delay)
+
+    async def fetch(
+        self,
+        url: str,
+        handler: Callable[[aiohttp.ClientResponse], Awaitable[T]],
+        *,
+        headers: dict[str, str] | None = None,
+    ) -> T:
+        """GET ``url`` and pass the response to ``handler``, retrying transient failures.
+
+        ``handler`` reads the body, so it may be called again on a retry.
+        """
+        if self._rewrite_url is not None:
+            url = self._rewrite_url(url)
+
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    async with self._session.get(
+                        url, headers=headers, timeout=self._timeout
+                    ) as resp:
+                        if resp.status in RETRY_STATUSES:
+                            retry_after = resp.headers.get("Retry-After", "")
+                            raise RetryableStatusError(
+                                resp.status,
+                                float(retry_after) if retry_after.isdigit() else None,
+                            )
+                        resp.raise_for_status()
+                        return await handler(resp)
+            except aiohttp.ClientResponseError:
+                raise
+            except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                RetryableStatusError,
+            ) as e:
+                if attempt >= self._max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                attempt += 1
+                LOGGER_.warning(
+                    "Request to %s failed (%s), retrying in %.1fs (%d/%d)",
+                    url,
+                    e,
+                    delay,
+                    attempt,
+                    self._max_retries,
+                )
+                await asyncio.sleep(delay)
+
+
+class JSONCooker(ABC):
+    def __init__(
+        self,
+        session: aiohttp.ClientSession | None,
+        *,
+        scheduler: DownloadScheduler | None = None,
+        jobs: int = 1,
+        incremental: bool = False,
+        raw_compression: str = "none",
+        raw_compression_level: int | None = None,
+        output_formats: Iterable[str] = (),
+        executor: CPUExecutor | None = None,
+    ) -> None:
+        if scheduler is None and session is not None:
+            scheduler = DownloadScheduler(session)
+        self._scheduler = scheduler
+        self._executor = executor or CPUExecutor()
+        self._data = Datasets(self._raw_dir)
+        self._data.scan()
+        check_available(raw_compression)
+        self._raw_compression = raw_compression
+        self._raw_compression_level = raw_compression_level
+        self._output_formats = get_output_formats(output_formats)
+        self._jobs = jobs
+        self._incremental = incremental
+        self._http_cache = HTTPCache(
+            self._raw_dir.with_name(f"{self._game}.http_cache.json")
+        )
+        self._state = CookState(
+            self._raw_dir.with_name(f"{self._game}.cook_state.json"),
+            sorted(fmt.suffix for fmt in self._output_formats),
+        )
+        self._manifest = OutputManifest(Path("data/manifest.json"))
+        # Outputs are written together once every stage succeeded, None deletes
+        self._pending_outputs: dict[Path, bytes | None] = {}
+        self._raw_digests: dict[str, str] = {}
+        self._deobfuscations: dict[str, str] = {}
 
     _game: str
 
@@ -21,50 +196,310 @@ class JSONCooker:
     def _raw_dir(self) -> Path:
         return Path(f"raw_data/{self._game}")
 
+    def _index(self, name: str, field: str) -> dict[Any, Any]:
+        """Rows of dataset ``name`` keyed by ``field``, see ``Datasets.index``."""
+        return self._data.index(name, field)
+
+    def _load_output(self, name: str) -> Any | None:
+        """The previous content of output ``name``, None if missing or unreadable."""
+        try:
+            return orjson.loads(Path(f"data/{name}.json").read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+
+    async def _read_intact_raw(self, name: str, sha256: str) -> bytes | None:
+        """Read a raw file, returning None if it is missing, unreadable or does not
+        match ``sha256``, so that it is downloaded again.
+        """
+        try:
+            raw = await asyncio.to_thread(self._data.read_raw, name)
+        except (KeyError, FileNotFoundError):
+            return None
+        except READ_ERRORS as e:
+            LOGGER_.warning("Raw %s is unreadable (%s), ignoring it", name, e)
+            return None
+        if hashlib.sha256(raw).hexdigest() != sha256:
+            LOGGER_.warning("Raw %s does not match its cached hash, ignoring it", name)
+            return None
+        return raw
+
+    async def _conditional_request(
+        self, url: str, name: str, variant: str = ""
+    ) -> tuple[dict[str, str], bytes | None]:
+        """Return the request headers for ``url`` and the raw file they revalidate."""
+        entry = self._http_cache.lookup(url, variant)
+        if entry is None:
+            return {}, None
+        raw = await self._read_intact_raw(name, entry["sha256"])
+        if raw is None:
+            return {}, None
+        return HTTPCache.conditional_headers(entry), raw
+
+    def _use_cached_raw(self, name: str, raw: bytes) -> None:
+        LOGGER_.info("%s is unchanged upstream, using raw cache", name)
+        self._data.set_raw(name, raw)
+
+    @instrumented("download", label="name")
     async def _download(self, url: str, name: str) -> None:
-        if self._session is None:
+        if self._scheduler is None:
             raise RuntimeError("Cannot download: session is None")
         LOGGER_.info("Downloading %s from %s", name, url)
-        try:
-            async with self._session.get(url) as resp:
-                self._data[name] = orjson.loads(await resp.text(encoding="utf-8"))
-        except Exception as e:
-            LOGGER_.error("Failed to download %s: %s", name, e)
-            raise e
 
-    async def _save_raw(self, name: str) -> None:
+        headers, cached = await self._conditional_request(url, name)
+
+        async def handle(resp: aiohttp.ClientResponse) -> None:
+            if resp.status == 304 and cached is not None:
+                self._use_cached_raw(name, cached)
+                return
+            raw = await resp.read()
+            add_bytes(read=len(raw))
+            self._http_cache.store(url, name, resp.headers)
+            await self._save_raw(name, raw)
+            self._data.set_raw(name, raw)
+
+        await self._scheduler.fetch(url, handle, headers=headers)
+
+    @instrumented("download", label="name")
+    async def _download_text_map(
+        self, url: str, name: str, hashes: Iterable[int]
+    ) -> None:
+        """Stream a TextMap and only keep the entries whose hash is in ``hashes``."""
+        if self._scheduler is None:
+            raise RuntimeError("Cannot download: session is None")
+        LOGGER_.info("Streaming %s from %s", name, url)
+        string_hashes = frozenset(str(h) for h in hashes)
+        # The raw file only holds a subset, so it is only reusable for the same hashes
+        variant = hashlib.sha256(",".join(sorted(string_hashes)).encode()).hexdigest()
+
+        headers, cached = await self._conditional_request(url, name, variant)
+
+        async def handle(resp: aiohttp.ClientResponse) -> None:
+            if resp.status == 304 and cached is not None:
+                self._use_cached_raw(name, cached)
+                return
+            stream_filter = TextMapStreamFilter(string_hashes)
+            async for chunk in resp.content.iter_chunked(1 << 16):
+                add_bytes(read=len(chunk))
+                stream_filter.feed(chunk)
+            text_map = stream_filter.close()
+            self._http_cache.store(url, name, resp.headers, variant)
+            await self._save_raw(name, orjson.dumps(text_map))
+            self._data[name] = text_map
+
+        await self._scheduler.fetch(url, handle, headers=headers)
+
+    def _write_raw(self, path: Path, raw: bytes) -> str:
+        """Compress and write a raw file in one go, return the hash of ``raw``."""
+        stored = compress(raw, self._raw_compression, self._raw_compression_level)
+        write_atomic(path, stored)
+        add_bytes(written=len(stored))
+        return hashlib.sha256(raw).hexdigest()
+
+    async def _save_raw(self, name: str, raw: bytes) -> None:
         self._raw_dir.mkdir(parents=True, exist_ok=True)
-        path = self._raw_dir / f"{name}.json"
+        path = raw_path(self._raw_dir, name, self._raw_compression)
         LOGGER_.info("Saving raw %s...", name)
         try:
-            async with aiofiles.open(path, "w", encoding="utf-8") as f:
-                await f.write(orjson.dumps(self._data[name]).decode())
+            sha256 = await asyncio.to_thread(self._write_raw, path, raw)
+            self._http_cache.set_hash(name, sha256)
+            self._data.add_file(name, path)
+
+            # Only keep the raw file of the current format around
+            for compression in SUFFIXES:
+                if compression != self._raw_compression:
+                    raw_path(self._raw_dir, name, compression).unlink(missing_ok=True)
         except Exception as e:
-            LOGGER_.error("Failed to save raw %s: %s", name, e)
+            e.add_note(f"Failed to save raw {name}")
             raise e
 
-    async def _load_raw(self, name: str) -> None:
-        path = self._raw_dir / f"{name}.json"
-        LOGGER_.info("Loading raw %s...", name)
+    async def _filter_text_maps(
+        self, names: Iterable[str], hashes: Iterable[int]
+    ) -> dict[str, dict[str, str]]:
+        names = list(names)
+        string_hashes = frozenset(str(h) for h in hashes)
+
+        if self._jobs <= 1:
+            return {
+                name: filter_text_map(self._data[name], string_hashes) for name in names
+            }
+
+        LOGGER_.info("Filtering %d TextMaps with %d jobs...", len(names), self._jobs)
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(self._jobs) as pool:
+            results = await asyncio.gather(
+                *[
+                    loop.run_in_executor(
+                        pool,
+                        load_and_filter_text_map,
+                        self._data.file(name),
+                        string_hashes,
+                    )
+                    for name in names
+                ]
+            )
+
+        for name in names:
+            self._data.release(name)
+        return dict(zip(names, results))
+
+    def _raw_digest(self, name: str) -> str:
+        if name not in self._raw_digests:
+            try:
+                raw = self._data.read_raw(name)
+            except (KeyError, FileNotFoundError):
+                self._raw_digests[name] = "missing"
+            else:
+                self._raw_digests[name] = hashlib.sha256(raw).hexdigest()
+        return self._raw_digests[name]
+
+    def _stage_digest(self, stage: Stage) -> str:
+        sha = hashlib.sha256()
+        for name in stage_inputs(stage):
+            sha.update(f"{name}:{self._raw_digest(name)};".encode())
+        return sha.hexdigest()
+
+    async def _pending_stages(self, stages: list[Stage]) -> list[Stage]:
+        """Return the stages that need to run, all of them unless cooking incrementally."""
+        if not self._incremental:
+            return stages
+
+        digests = await asyncio.to_thread(
+            lambda: [self._stage_digest(s) for s in stages]
+        )
+        pending: list[Stage] = []
+        for stage, digest in zip(stages, digests):
+            if self._state.is_fresh(stage.__name__, digest):
+                LOGGER_.info("Skipping %s, inputs are unchanged", stage.__name__)
+            else:
+                pending.append(stage)
+        return pending
+
+    def _in_process_inputs(self, stage: Stage) -> list[str]:
+        """The inputs of ``stage`` that are loaded in this process."""
+        inputs = stage_inputs(stage)
+        if self._jobs > 1:
+            # TextMaps are loaded by the worker processes themselves
+            return [name for name in inputs if not name.startswith("text_map_")]
+        return list(inputs)
+
+    async def _run_cpu(self, func: Callable[..., T], *args: Any) -> T:
+        """Run a cook body or serialization on the CPU executor, off the event loop."""
+        return await self._executor.run(func, *args)
+
+    async def _run_stage(self, stage: Stage) -> None:
+        await asyncio.to_thread(self._data.parse, self._in_process_inputs(stage))
+
+        outputs: list[str] = []
+        token = _stage_outputs.set(outputs)
         try:
-            async with aiofiles.open(path, "r", encoding="utf-8") as f:
-                self._data[name] = orjson.loads(await f.read())
-        except Exception as e:
-            LOGGER_.error("Failed to load raw %s: %s", name, e)
-            raise e
+            await stage()
+        finally:
+            _stage_outputs.reset(token)
+        digest = await asyncio.to_thread(self._stage_digest, stage)
+        self._state.record(stage.__name__, digest, outputs)
 
-    async def _load_all_raw(self) -> None:
-        paths = list(self._raw_dir.glob("*.json"))
-        await asyncio.gather(*[self._load_raw(p.stem) for p in paths])
+    def _project_datasets(self, stages: list[Stage]) -> None:
+        """Keep only the fields ``stages`` read from the rows of each dataset.
+
+        A dataset is projected only if every stage consuming it declared
+        the fields it needs.
+        """
+        fields: dict[str, set[str]] = {}
+        whole: set[str] = set()
+        for stage in stages:
+            declared = stage_fields(stage)
+            for name in stage_inputs(stage):
+                if name in declared:
+                    fields.setdefault(name, set()).update(declared[name])
+                else:
+                    whole.add(name)
+
+        for name in fields.keys() - whole:
+            if name in self._data:
+                self._data.transform([name], projection(fields[name]))
+
+    async def _run_stages(self, stages: list[Stage]) -> None:
+        """Run independent stages concurrently, as many at once as the executor has workers."""
+        await asyncio.to_thread(self._project_datasets, stages)
+        remaining = Counter(
+            name for stage in stages for name in self._in_process_inputs(stage)
+        )
+        semaphore = asyncio.Semaphore(self._executor.workers)
+
+        async def run(stage: Stage) -> None:
+            async with semaphore:
+                await self._run_stage(stage)
+
+            # Release the datasets no other pending stage consumes
+            for name in self._in_process_inputs(stage):
+                remaining[name] -= 1
+                if remaining[name] == 0:
+                    self._data.release(name)
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                for stage in stages:
+                    group.create_task(run(stage))
+        except ExceptionGroup as e:
+            # The other stages are cancelled on the first failure
+            raise e.exceptions[0] from None
+
+    def _write_outputs(self) -> None:
+        written = unchanged = 0
+        for path, content in self._pending_outputs.items():
+            if content is None:
+                path.unlink(missing_ok=True)
+                self._manifest.remove(path)
+                continue
+            sha256, changed = write_if_changed(path, content)
+            self._manifest.record(path, sha256, len(content))
+            if changed:
+                add_bytes(written=len(content))
+                written += 1
+            else:
+                unchanged += 1
+        LOGGER_.info("Wrote %d outputs, %d unchanged", written, unchanged)
+        self._pending_outputs.clear()
+
+    @instrumented("write")
+    async def _commit_outputs(self) -> None:
+        """Write the outputs of the cooked stages, then the manifest and cook state."""
+        await asyncio.to_thread(self._write_outputs)
+        self._manifest.save()
+        self._state.save()
 
     async def _save_data(self, name: str, data: Any) -> None:
         LOGGER_.info("Saving %s.json...", name)
+        if (outputs := _stage_outputs.get()) is not None:
+            outputs.extend(f"{name}{fmt.suffix}" for fmt in self._output_formats)
         try:
-            async with aiofiles.open(f"data/{name}.json", "w", encoding="utf-8") as f:
-                bytes_ = orjson.dumps(
-                    data, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
-                )
-                await f.write(bytes_.decode())
+            encoded = await self._run_cpu(encode_outputs, data, self._output_formats)
+            # Drop the variants of formats that are no longer requested
+            for fmt in OUTPUT_FORMATS.values():
+                path = Path(f"data/{name}{fmt.suffix}")
+                self._pending_outputs[path] = encoded.get(fmt.suffix)
+        except Exception as e:
+            e.add_note(f"Failed to save {name}")
+            raise e
+
+    async def _save_text_map_bundle(
+        self, name: str, text_maps: dict[str, dict[str, str]]
+    ) -> None:
+        """Save ``{lang: {key: text}}`` as a binary bundle, see ``TextMapBundle``."""
+        LOGGER_.info("Saving %s.bin...", name)
+        if (outputs := _stage_outputs.get()) is not None:
+            outputs.append(f"{name}.bin")
+        try:
+            bundle = await self._run_cpu(build_text_map_bundle, text_maps)
+            self._pending_outputs[Path(f"data/{name}.bin")] = bundle
         except Exception as e:
-            LOGGER_.error("Failed to save %s: %s", name, e)
+            e.add_note(f"Failed to save {name}")
             raise e
+
+    @abstractmethod
+    async def download(self) -> None:
+        """Download the raw datasets of the game, or revalidate their cache."""
+
+    @abstractmethod
+    async def dump(self) -> None:
+        """Cook the downloaded datasets and write the outputs."""
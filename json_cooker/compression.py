@@ -0,0 +1,72 @@
+import gzip
+from pathlib import Path
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+DEFAULT_LEVELS = {"none": 0, "gzip": 6, "zstd": 10}
+
+# What read_raw raises on an unreadable file, truncated or corrupt alike
+READ_ERRORS: tuple[type[Exception], ...] = (OSError, EOFError, zlib.error)
+if zstandard is not None:
+    READ_ERRORS += (zstandard.ZstdError,)
+
+
+def check_available(compression: str) -> None:
+    if compression not in SUFFIXES:
+        msg = f"Unknown compression {compression!r}, expected one of {list(SUFFIXES)}"
+        raise ValueError(msg)
+    if compression == "zstd" and zstandard is None:
+        msg = "zstd compression requires the 'zstd' extra (uv sync --extra zstd)"
+        raise RuntimeError(msg)
+
+
+def raw_path(directory: Path, name: str, compression: str) -> Path:
+    return directory / f"{name}.json{SUFFIXES[compression]}"
+
+
+def parse_raw_path(path: Path) -> tuple[str, str] | None:
+    """Return the dataset name and compression of a raw file, None if it is not one."""
+    for compression, suffix in SUFFIXES.items():
+        if suffix and path.name.endswith(f".json{suffix}"):
+            return path.name.removesuffix(f".json{suffix}"), compression
+    if path.name.endswith(".json"):
+        return path.name.removesuffix(".json"), "none"
+    return None
+
+
+def compress(raw: bytes, compression: str, level: int | None = None) -> bytes:
+    check_available(compression)
+    if level is None:
+        level = DEFAULT_LEVELS[compression]
+
+    if compression == "gzip":
+        # A fixed mtime keeps the output reproducible for identical inputs
+        return gzip.compress(raw, compresslevel=level, mtime=0)
+    if compression == "zstd":
+        assert zstandard is not None
+        return zstandard.ZstdCompressor(level=level).compress(raw)
+    return raw
+
+
+def read_raw(path: Path) -> bytes:
+    """Read a raw file, decompressing it as a stream if needed."""
+    parsed = parse_raw_path(path)
+    compression = parsed[1] if parsed is not None else "none"
+    check_available(compression)
+
+    if compression == "gzip":
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    if compression == "zstd":
+        assert zstandard is not None
+        with (
+            path.open("rb") as f,
+            zstandard.ZstdDecompressor().stream_reader(f) as reader,
+        ):
+            return reader.read()
+    return path.read_bytes()
@@ -0,0 +1,145 @@
+from collections.abc import Callable, Iterable, Iterator, MutableMapping
+import logging
+from pathlib import Path
+import threading
+from typing import Any
+
+import orjson
+
+from .compression import parse_raw_path, read_raw
+from .profiling import add_bytes
+from .utils import instrumented
+
+LOGGER_ = logging.getLogger(__name__)
+
+
+class Datasets(MutableMapping[str, Any]):
+    """Datasets keyed by name, parsed from their raw JSON on first access.
+
+    A dataset comes from raw bytes kept in memory or from its file in
+    ``directory``. Datasets backed by a file can be released once no longer
+    needed and are transparently reloaded if accessed again.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self._directory = directory
+        self._parsed: dict[str, Any] = {}
+        self._raw: dict[str, bytes] = {}
+        self._files: dict[str, Path] = {}
+        self._transforms: list[tuple[frozenset[str], Callable[[Any], Any]]] = []
+        self._indexes: dict[tuple[str, str], dict[Any, Any]] = {}
+        # Stages running concurrently may parse the same dataset or build
+        # indexes in worker threads while others are dropped on the event loop
+        self._lock = threading.RLock()
+
+    def file(self, name: str) -> Path:
+        return self._files[name]
+
+    def scan(self) -> None:
+        """Register every raw file of the directory without reading it."""
+        paths = sorted(self._directory.glob("*.json*"), key=lambda p: p.stat().st_mtime)
+        for path in paths:
+            # The most recently written format wins if several are present
+            if (parsed := parse_raw_path(path)) is not None:
+                self._files[parsed[0]] = path
+
+    def add_file(self, name: str, path: Path) -> None:
+        self._files[name] = path
+
+    def read_raw(self, name: str) -> bytes:
+        """Read the uncompressed raw bytes of a dataset from its file."""
+        return read_raw(self._files[name])
+
+    def set_raw(self, name: str, raw: bytes) -> None:
+        """Register the raw bytes of a dataset, it is only parsed once accessed."""
+        self._parsed.pop(name, None)
+        self._drop_indexes(name)
+        self._raw[name] = raw
+
+    def transform(self, names: Iterable[str], func: Callable[[Any], Any]) -> None:
+        """Apply ``func`` to the given datasets now if parsed, or whenever they get parsed."""
+        names = frozenset(names)
+        self._transforms.append((names, func))
+        for name in names & self._parsed.keys():
+            self._parsed[name] = func(self._parsed[name])
+            self._drop_indexes(name)
+
+    def parse(self, names: Iterable[str]) -> None:
+        """Parse the given datasets ahead of time, meant to be run in a worker thread."""
+        for name in names:
+            if name in self:
+                self[name]
+
+    def index(self, name: str, field: str) -> dict[Any, Any]:
+        """Return the rows of a dataset keyed by ``field``, built once and cached.
+
+        Rows without ``field`` are left out. If several rows share the same
+        value, the last one wins.
+        """
+        key = (name, field)
+        with self._lock:
+            if key not in self._indexes:
+                rows = self[name]
+                if isinstance(rows, dict):
+                    rows = rows.values()
+                self._indexes[key] = {row[field]: row for row in rows if field in row}
+            return self._indexes[key]
+
+    def release(self, name: str) -> None:
+        """Free the memory of a dataset that can be reloaded from its file."""
+        if name in self._files:
+            self._parsed.pop(name, None)
+            self._raw.pop(name, None)
+            self._drop_indexes(name)
+
+    def _drop_indexes(self, name: str) -> None:
+        with self._lock:
+            for key in [key for key in self._indexes if key[0] == name]:
+                del self._indexes[key]
+
+    @instrumented("load", label="name")
+    def _load(self, name: str) -> Any:
+        if name in self._raw:
+            value = orjson.loads(self._raw[name])
+            del self._raw[name]
+        elif name in self._files:
+            LOGGER_.info("Loading raw %s...", name)
+            raw = self.read_raw(name)
+            add_bytes(read=len(raw))
+            value = orjson.loads(raw)
+        else:
+            raise KeyError(name)
+
+        for names, func in self._transforms:
+            if name in names:
+                value = func(value)
+        return value
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._parsed:
+            with self._lock:
+                if name not in self._parsed:
+                    self._parsed[name] = self._load(name)
+        return self._parsed[name]
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        self._raw.pop(name, None)
+        self._drop_indexes(name)
+        self._parsed[name] = value
+
+    def __delitem__(self, name: str) -> None:
+        if name not in self:
+            raise KeyError(name)
+        self._parsed.pop(name, None)
+        self._raw.pop(name, None)
+        self._files.pop(name, None)
+        self._drop_indexes(name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._parsed or name in self._raw or name in self._files
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._parsed.keys() | self._raw.keys() | self._files.keys())
+
+    def __len__(self) -> int:
+        return len(self._parsed.keys() | self._raw.keys() | self._files.keys())
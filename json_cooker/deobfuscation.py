@@ -0,0 +1,294 @@
+from collections.abc import Callable, Iterable, Mapping
+import functools
+import logging
+from typing import Any, NamedTuple
+
+from .datasets import Datasets
+from .utils import instrumented
+
+LOGGER_ = logging.getLogger(__name__)
+
+
+def rename_keys(obj: Any, lookup: dict[str, str]) -> Any:
+    """Return a copy of ``obj`` with every dict key found in ``lookup`` renamed.
+
+    Only keys are remapped, string values are left untouched even if they
+    happen to contain an obfuscated token.
+    """
+    if isinstance(obj, dict):
+        return {
+            lookup.get(k, k): rename_keys(v, lookup)
+            if isinstance(v, (dict, list))
+            else v
+            for k, v in obj.items()
+        }
+    if isinstance(obj, list):
+        return [
+            rename_keys(v, lookup) if isinstance(v, (dict, list)) else v for v in obj
+        ]
+    return obj
+
+
+Predicate = Callable[[Any, Mapping[str, str]], bool]
+"""Matches a value, given the deobfuscations resolved so far."""
+
+
+class Rule(NamedTuple):
+    """Where to find the obfuscated name of ``key``.
+
+    The candidate rows are the ``rows`` of the ``dataset`` container reached
+    through ``path``: a row index, every row if None, or the rows whose
+    ``(key, value)`` field matches. A dataset reached as a dict is a single
+    row. ``key`` is the field of those rows whose value is ``match``, or
+    satisfies it when it is a predicate. Names of other rules in ``path``
+    and ``rows`` are replaced by their obfuscated names.
+    """
+
+    key: str
+    dataset: str
+    match: Any
+    rows: int | tuple[str, Any] | None = None
+    path: tuple[str | int, ...] = ()
+
+
+def digits(count: int) -> Predicate:
+    """Values written with ``count`` characters, e.g. 8 digit avatar IDs."""
+    return lambda value, _: len(str(value)) == count
+
+
+def is_list(value: Any, _: Mapping[str, str]) -> bool:
+    return isinstance(value, list)
+
+
+def contains(text: str) -> Predicate:
+    return lambda value, _: isinstance(value, str) and text in value
+
+
+def first_item(key: str, expected: Any) -> Predicate:
+    """Lists whose first item has ``expected`` as the value of rule ``key``."""
+
+    def predicate(value: Any, deobfuscations: Mapping[str, str]) -> bool:
+        return (
+            isinstance(value, list)
+            and bool(value)
+            and isinstance(value[0], dict)
+            and value[0].get(deobfuscations[key]) == expected
+        )
+
+    setattr(predicate, "requires", (key,))
+    return predicate
+
+
+class _ValueIndex:
+    """Keys of the candidate rows, grouped by value in first-seen order."""
+
+    def __init__(self, rows: Iterable[dict[str, Any]]) -> None:
+        self.values: dict[Any, dict[str, None]] = {}
+        self.unhashable: list[tuple[str, Any]] = []
+        for row in rows:
+            for k, v in row.items():
+                if isinstance(v, (dict, list)):
+                    self.unhashable.append((k, v))
+                else:
+                    self.values.setdefault(v, {})[k] = None
+
+    def find(self, match: Any, deobfuscations: Mapping[str, str]) -> list[str]:
+        if not callable(match):
+            return list(self.values.get(match, ()))
+
+        keys: dict[str, None] = {}
+        for value, value_keys in self.values.items():
+            if match(value, deobfuscations):
+                keys.update(value_keys)
+        for k, value in self.unhashable:
+            if match(value, deobfuscations):
+                keys[k] = None
+        return list(keys)
+
+
+class _MissingDependency(Exception):
+    pass
+
+
+class Deobfuscator:
+    datasets: tuple[str, ...]
+    """Names of the datasets whose keys are obfuscated."""
+    rules: tuple[Rule, ...]
+    """How to find every known key, in dependency order."""
+
+    def __init__(self, data: Datasets) -> None:
+        self._data = data
+        self.deobfuscations: dict[str, str] = {}
+        self._indexes: dict[tuple[Any, ...], _ValueIndex | None] = {}
+
+    def _dependencies(self, rule: Rule) -> list[str]:
+        """The other rules ``rule`` needs to be resolved first."""
+        names = [p for p in rule.path if isinstance(p, str)]
+        if isinstance(rule.rows, tuple):
+            names.append(rule.rows[0])
+        names.extend(getattr(rule.match, "requires", ()))
+        return [name for name in names if any(r.key == name for r in self.rules)]
+
+    def _resolve(self, name: str | int) -> str | int:
+        if not isinstance(name, str) or all(rule.key != name for rule in self.rules):
+            return name
+        if name not in self.deobfuscations:
+            raise _MissingDependency(name)
+        return self.deobfuscations[name]
+
+    def _rows(self, dataset: str, path: tuple[str | int, ...]) -> list[Any] | None:
+        try:
+            container = self._data[dataset]
+            for p in path:
+                container = container[p]
+        except (KeyError, IndexError, TypeError):
+            return None
+        return [container] if isinstance(container, dict) else container
+
+    def _index(self, rule: Rule) -> _ValueIndex | None:
+        path = tuple(self._resolve(p) for p in rule.path)
+        rows = rule.rows
+        if isinstance(rows, tuple):
+            rows = (self._resolve(rows[0]), rows[1])
+
+        cache_key = (rule.dataset, path, rows)
+        if cache_key not in self._indexes:
+            # One pass over the candidate rows, shared by every rule selecting them
+            candidates = self._rows(rule.dataset, path)
+            if candidates is None:
+                self._indexes[cache_key] = None
+                return None
+
+            if isinstance(rows, int):
+                candidates = candidates[rows : rows + 1]
+            elif isinstance(rows, tuple):
+                field, value = rows
+                candidates = [row for row in candidates if row.get(field) == value]
+            self._indexes[cache_key] = _ValueIndex(candidates)
+        return self._indexes[cache_key]
+
+    def _is_plausible(self, rule: Rule, obfuscated: str) -> bool:
+        """Whether ``obfuscated`` still looks like ``rule.key`` in a sample row.
+
+        Rules matching a given row are checked exactly, others only by the
+        type of the value in the first row since the match may be elsewhere.
+        """
+        try:
+            for name in self._dependencies(rule):
+                self._resolve(name)
+            path = tuple(self._resolve(p) for p in rule.path)
+        except _MissingDependency:
+            return False
+
+        rows = self._rows(rule.dataset, path)
+        row_index = rule.rows if isinstance(rule.rows, int) else 0
+        if not rows or row_index >= len(rows) or not isinstance(rows[row_index], dict):
+            return False
+        row = rows[row_index]
+        if obfuscated not in row:
+            return False
+
+        value = row[obfuscated]
+        if callable(rule.match):
+            if isinstance(rule.rows, int) or rule.match is is_list:
+                return bool(rule.match(value, self.deobfuscations))
+            return True
+        if isinstance(rule.rows, int):
+            return value == rule.match
+        return isinstance(value, type(rule.match))
+
+    def _reuse(self, rules: list[Rule], cached: Mapping[str, str]) -> bool:
+        """Adopt the cached names of ``rules`` if they all pass validation."""
+        drifted: list[str] = []
+        for rule in rules:
+            obfuscated = cached.get(rule.key)
+            if obfuscated is None or not self._is_plausible(rule, obfuscated):
+                drifted.append(rule.key)
+                continue
+            self.deobfuscations[rule.key] = obfuscated
+
+        if drifted:
+            LOGGER_.warning(
+                "Cached deobfuscations drifted for %s, rediscovering all keys",
+                ", ".join(drifted),
+            )
+            for rule in rules:
+                self.deobfuscations.pop(rule.key, None)
+            return False
+        LOGGER_.info("Reusing %d cached deobfuscations", len(rules))
+        return True
+
+    def discover(
+        self,
+        keys: Iterable[str] | None = None,
+        *,
+        cached: Mapping[str, str] | None = None,
+    ) -> None:
+        """Find the obfuscated name of the given keys and the keys they depend on, all by default.
+
+        The names in ``cached``, usually those of the previous run, are
+        reused as long as they pass a quick check against sample rows.
+        Every key that cannot be found is reported at once.
+        """
+        wanted = set(keys) if keys is not None else None
+        rules = self._rules_for(wanted)
+        if cached and self._reuse(rules, cached):
+            return
+
+        missing: list[str] = []
+        ambiguous: list[str] = []
+
+        for rule in rules:
+            if rule.key in self.deobfuscations:
+                continue
+            try:
+                for name in self._dependencies(rule):
+                    self._resolve(name)
+                index = self._index(rule)
+            except _MissingDependency as e:
+                missing.append(f"{rule.key} in {rule.dataset!r} (needs {e})")
+                continue
+
+            found = index.find(rule.match, self.deobfuscations) if index else []
+            if not found:
+                missing.append(f"{rule.key} in {rule.dataset!r}")
+                continue
+            if len(found) > 1:
+                ambiguous.append(f"{rule.key} in {rule.dataset!r}: {found}")
+            # The first match wins, like the first field of the first row
+            self.deobfuscations[rule.key] = found[0]
+
+        if ambiguous:
+            LOGGER_.warning(
+                "Ambiguous deobfuscations, using the first match: %s",
+                "; ".join(ambiguous),
+            )
+        if missing:
+            raise ValueError(f"Failed to find {', '.join(missing)}")
+
+    def _rules_for(self, wanted: set[str] | None) -> list[Rule]:
+        if wanted is None:
+            return list(self.rules)
+
+        # Pull in the rules the wanted ones depend on through their path or rows
+        needed = set(wanted)
+        for rule in reversed(self.rules):
+            if rule.key in needed:
+                needed.update(self._dependencies(rule))
+        return [rule for rule in self.rules if rule.key in needed]
+
+    @instrumented("deobfuscate")
+    def deobfuscate(self, cached: Mapping[str, str] | None = None) -> None:
+        self.discover(cached=cached)
+        LOGGER_.info("Deobfuscations: %s", self.deobfuscations)
+
+        lookup = {
+            obfuscated: deobfuscated
+            for deobfuscated, obfuscated in self.deobfuscations.items()
+            if obfuscated != deobfuscated
+        }
+        if lookup:
+            # Datasets that are not loaded yet are renamed once parsed
+            self._data.transform(
+                self.datasets, functools.partial(rename_keys, lookup=lookup)
+            )
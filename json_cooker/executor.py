@@ -0,0 +1,48 @@
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import functools
+import os
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+class CPUExecutor:
+    """Runs CPU-bound work off the event loop, in worker threads or processes.
+
+    Threads share the parsed datasets for free, processes side-step the GIL
+    at the cost of pickling arguments and results, so functions run in
+    process mode must be module-level and only get plain data.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int | None = None) -> None:
+        if kind not in EXECUTOR_KINDS:
+            msg = f"Unknown executor kind {kind!r}, expected one of {EXECUTOR_KINDS}"
+            raise ValueError(msg)
+        self.kind = kind
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="cook"
+                )
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), functools.partial(func, *args, **kwargs)
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -3,10 +3,9 @@ import contextlib
 import logging
 from typing import Any
 
-import orjson
-
 from ..base import JSONCooker
-from ..utils import async_error_handler
+from ..deobfuscation import Deobfuscator, Rule, digits, is_list
+from ..utils import instrumented, stage
 from .data import (
     ARTIFACT_SETS,
     ARTIFACTS,
@@ -24,146 +23,97 @@ from .data import (
 LOGGER_ = logging.getLogger(__name__)
 
 
-class GenshinDeobfuscator:
-    def __init__(self, data: dict[str, Any]) -> None:
-        self._data = data
-        self.deobfuscations: dict[str, str] = {}
-
-    def avatarId(self) -> None:
-        avatarId = next(
-            (
-                k
-                for k, v in self._data["fetter_character_card"][0].items()
-                if len(str(v)) == 8
-            ),
-            None,
-        )
-        if avatarId is None:
-            raise ValueError("Failed to find avatarId in 'fetter_character_card'")
-        self.deobfuscations["avatarId"] = avatarId
-
-    def rewardId(self) -> None:
-        rewardId = next(
-            (
-                k
-                for k, v in self._data["fetter_character_card"][0].items()
-                if len(str(v)) == 6
-            ),
-            None,
-        )
-        if rewardId is None:
-            raise ValueError("Failed to find rewardId in 'fetter_character_card'")
-        self.deobfuscations["rewardId"] = rewardId
-
-    def rewardItemList(self) -> None:
-        rewardItemList = next(
-            (k for k, v in self._data["rewards"][0].items() if isinstance(v, list)),
-            None,
-        )
-        if rewardItemList is None:
-            raise ValueError("Failed to find rewardItemList in 'rewards'")
-        self.deobfuscations["rewardItemList"] = rewardItemList
-
-    def itemId(self) -> None:
-        itemId = next(
-            (
-                k
-                for k, v in self._data["rewards"][0][
-                    self.deobfuscations["rewardItemList"]
-                ][0].items()
-                if len(str(v)) == 6
-            ),
-            None,
-        )
-        if itemId is None:
-            raise ValueError("Failed to find itemId in rewards")
-        self.deobfuscations["itemId"] = itemId
-
-    def id(self) -> None:
-        id = next(
-            (k for k, v in self._data["talents"][0].items() if len(str(v)) == 5), None
-        )
-        if id is None:
-            raise ValueError("Failed to find id in 'talents'")
-        self.deobfuscations["id"] = id
-
-    def nameTextMapHash(self) -> None:
-        nameTextMapHash = next(
-            (
-                k
-                for talent in self._data["talents"]
-                for k, v in talent.items()
-                if v == 4051912989
-            ),
-            None,
-        )
-        if nameTextMapHash is None:
-            raise ValueError("Failed to find nameTextMapHash in 'talents'")
-        self.deobfuscations["nameTextMapHash"] = nameTextMapHash
-
-    def skillIcon(self) -> None:
-        skillIcon = next(
-            (
-                k
-                for talent in self._data["talents"]
-                for k, v in talent.items()
-                if v == "Skill_A_01"
-            ),
-            None,
-        )
-        if skillIcon is None:
-            raise ValueError("Failed to find skillIcon in 'talents'")
-        self.deobfuscations["skillIcon"] = skillIcon
-
-    def icon(self) -> None:
-        icon = next(
-            (
-                k
-                for const in self._data["consts"]
-                for k, v in const.items()
-                if v == "UI_Talent_S_Ayaka_01"
-            ),
-            None,
-        )
-        if icon is None:
-            raise ValueError("Failed to find icon in 'consts'")
-        self.deobfuscations["icon"] = icon
-
-    def talentId(self) -> None:
-        talentId = next(
-            (
-                k
-                for const in self._data["consts"]
-                for k, v in const.items()
-                if v == 21
-                and const[self.deobfuscations["icon"]] == "UI_Talent_S_Ayaka_01"
-            ),
-            None,
-        )
-        if talentId is None:
-            raise ValueError("Failed to find talentId in 'consts'")
-        self.deobfuscations["talentId"] = talentId
-
-    def deobfuscate(self) -> dict[str, Any]:
-        self.avatarId()
-        self.rewardId()
-        self.rewardItemList()
-        self.itemId()
-        self.id()
-        self.nameTextMapHash()
-        self.skillIcon()
-        self.icon()
-        self.talentId()
-
-        LOGGER_.info("Deobfuscations: %s", self.deobfuscations)
+class GenshinDeobfuscator(Deobfuscator):
+    datasets = (
+        "artifacts",
+        "artifact_sets",
+        "talents",
+        "consts",
+        "rewards",
+        "fetter_character_card",
+    )
+
+    rules = (
+        Rule("avatarId", "fetter_character_card", digits(8), rows=0),
+        Rule("rewardId", "fetter_character_card", digits(6), rows=0),
+        Rule("rewardItemList", "rewards", is_list, rows=0),
+        Rule("itemId", "rewards", digits(6), rows=0, path=(0, "rewardItemList")),
+        Rule("id", "talents", digits(5), rows=0),
+        Rule("nameTextMapHash", "talents", 4051912989),
+        Rule("skillIcon", "talents", "Skill_A_01"),
+        Rule("icon", "consts", "UI_Talent_S_Ayaka_01"),
+        Rule("talentId", "consts", 21, rows=("icon", "UI_Talent_S_Ayaka_01")),
+    )
+
+
+def cook_talents(talents: list[dict[str, Any]]) -> dict[str, Any]:
+    result: dict[str, Any] = {}
+
+    for talent in talents:
+        result[str(talent["id"])] = {
+            "nameTextMapHash": talent["nameTextMapHash"],
+            "icon": talent.get("skillIcon", ""),
+        }
+
+    return result
+
+
+def cook_consts(consts: list[dict[str, Any]]) -> dict[str, Any]:
+    result: dict[str, Any] = {}
+
+    for const in consts:
+        result[str(const["talentId"])] = {
+            "nameTextMapHash": const["nameTextMapHash"],
+            "icon": const["icon"],
+        }
+
+    return result
+
+
+def cook_characters(
+    rewards: dict[int, dict[str, Any]],
+    character_cards: list[dict[str, int]],
+    namecards: dict[str, dict[str, str]],
+    characters: dict[str, Any],
+) -> dict[str, Any]:
+    """Add the namecard icon to ``characters``, ``rewards`` is keyed by rewardId."""
+    for character_card in character_cards:
+        if character_card["fetterLevel"] != 10:
+            continue
+
+        reward = rewards.get(character_card["rewardId"])
+        if reward is None:
+            continue
+
+        character_id = character_card["avatarId"]
+        item_id = reward["rewardItemList"][0]["itemId"]
+        namecard_icon = namecards[str(item_id)]["Icon"]
+        character_data = characters[str(character_id)]
+        character_data["NamecardIcon"] = namecard_icon
+
+    return characters
+
+
+def cook_artifacts(
+    artifacts: list[dict[str, Any]], artifact_sets: list[dict[str, Any]]
+) -> dict[str, Any]:
+    result: dict[str, Any] = {"Items": {}, "Sets": {}}
+
+    for artifact in artifacts:
+        with contextlib.suppress(KeyError):
+            result["Items"][str(artifact["id"])] = {
+                "rarity": artifact["rankLevel"],
+                "equipType": artifact["equipType"],
+                "icon": artifact["icon"],
+                "setId": artifact["setId"],
+            }
 
-        for k, v in self._data.items():
-            str_v = orjson.dumps(v).decode()
-            for deobfuscated, obfuscated in self.deobfuscations.items():
-                str_v = str_v.replace(obfuscated, deobfuscated)
-            self._data[k] = orjson.loads(str_v)
+    for artifact_set in artifact_sets:
+        result["Sets"][str(artifact_set["setId"])] = {
+            "name": "",
+        }
 
-        return self._data
+    return result
 
 
 class GenshinJSONCooker(JSONCooker):
@@ -181,127 +131,167 @@ class GenshinJSONCooker(JSONCooker):
             self._download(NAMECARDS, "namecards"),
             self._download(CHARACTERS, "characters"),
         ]
-        for lang in LANGS:
-            tasks.append(
-                self._download(
-                    TEXT_MAP.format(lang=lang),
-                    f"text_map_{lang}",
-                )
-            )
         await asyncio.gather(*tasks)
 
-    @async_error_handler
-    async def _cook_text_map(self) -> None:
-        loc_json = self._data["loc_json"]
+        # The excels are still obfuscated at this point. Parsing them and
+        # discovering the key blocks, so keep it off the loop other games share
+        deobfuscator = GenshinDeobfuscator(self._data)
+        await asyncio.to_thread(
+            deobfuscator.discover,
+            ["nameTextMapHash"],
+            cached=self._load_output("deobfuscations"),
+        )
+        text_map_hahes = await asyncio.to_thread(
+            self._text_map_hashes, deobfuscator.deobfuscations["nameTextMapHash"]
+        )
+
+        await asyncio.gather(
+            *[
+                self._download_text_map(
+                    TEXT_MAP.format(lang=lang), f"text_map_{lang}", text_map_hahes
+                )
+                for lang in LANGS
+            ]
+        )
 
+    def _text_map_hashes(self, key: str = "nameTextMapHash") -> list[int]:
         text_map_hahes: list[int] = [
-            artifact["nameTextMapHash"] for artifact in self._data["artifacts"]
+            artifact[key] for artifact in self._data["artifacts"]
         ]
-        text_map_hahes.extend(
-            [talent["nameTextMapHash"] for talent in self._data["talents"]]
-        )
-        text_map_hahes.extend(
-            [const["nameTextMapHash"] for const in self._data["consts"]]
+        text_map_hahes.extend([talent[key] for talent in self._data["talents"]])
+        text_map_hahes.extend([const[key] for const in self._data["consts"]])
+        return text_map_hahes
+
+    @stage(
+        "loc_json",
+        "artifacts",
+        "talents",
+        "consts",
+        *[f"text_map_{lang}" for lang in LANGS],
+        fields={
+            "artifacts": ["nameTextMapHash"],
+            "talents": ["nameTextMapHash"],
+            "consts": ["nameTextMapHash"],
+        },
+    )
+    @instrumented("stage")
+    async def _cook_text_map(self) -> None:
+        loc_json = self._data["loc_json"]
+        text_map_hahes = await asyncio.to_thread(self._text_map_hashes)
+
+        text_maps = await self._filter_text_maps(
+            [f"text_map_{lang}" for lang in LANGS], text_map_hahes
         )
 
         for lang, lang_code in LANGS.items():
-            text_map = self._data[f"text_map_{lang}"]
-
             # Add the translated texts to loc.json
-            for text_map_hash in text_map_hahes:
-                string_tm_hash = str(text_map_hash)
-                if string_tm_hash in text_map:
-                    loc_json[lang_code][string_tm_hash] = text_map[string_tm_hash]
+            loc_json[lang_code].update(text_maps[f"text_map_{lang}"])
 
             await self._save_data(f"text_map_{lang_code}", loc_json[lang_code])
 
         await self._save_data("text_map", loc_json)
+        await self._save_text_map_bundle("text_map", loc_json)
 
-    @async_error_handler
+    @stage("talents", fields={"talents": ["id", "nameTextMapHash", "skillIcon"]})
+    @instrumented("stage")
     async def _cook_talents(self) -> None:
-        talents = self._data["talents"]
-        result: dict[str, Any] = {}
-
-        for talent in talents:
-            result[str(talent["id"])] = {
-                "nameTextMapHash": talent["nameTextMapHash"],
-                "icon": talent.get("skillIcon", ""),
-            }
-
+        result = await self._run_cpu(cook_talents, self._data["talents"])
         await self._save_data("talents", result)
 
-    @async_error_handler
+    @stage(
+        "consts",
+        "talents",
+        fields={"consts": ["talentId", "nameTextMapHash", "icon"], "talents": []},
+    )
+    @instrumented("stage")
     async def _cook_consts(self) -> None:
-        consts = self._data["consts"]
-        result: dict[str, Any] = {}
-
-        for const in consts:
-            result[str(const["talentId"])] = {
-                "nameTextMapHash": const["nameTextMapHash"],
-                "icon": const["icon"],
-            }
-
+        result = await self._run_cpu(cook_consts, self._data["consts"])
         await self._save_data("consts", result)
 
-    @async_error_handler
+    @stage(
+        "rewards",
+        "fetter_character_card",
+        "namecards",
+        "characters",
+        fields={
+            "rewards": ["rewardId", "rewardItemList"],
+            "fetter_character_card": ["fetterLevel", "rewardId", "avatarId"],
+        },
+    )
+    @instrumented("stage")
     async def _cook_characters(self) -> None:
-        rewards: list[dict[str, Any]] = self._data["rewards"]
-        character_cards: list[dict[str, int]] = self._data["fetter_character_card"]
-        namecards: dict[str, dict[str, str]] = self._data["namecards"]
-        characters: dict[str, Any] = self._data["characters"]
-
-        for character_card in character_cards:
-            if character_card["fetterLevel"] != 10:
-                continue
-
-            character_id = character_card["avatarId"]
-            for reward in rewards:
-                if character_card["rewardId"] == reward["rewardId"]:
-                    item_id = reward["rewardItemList"][0]["itemId"]
-                    namecard_icon = namecards[str(item_id)]["Icon"]
-                    character_data = characters[str(character_id)]
-                    character_data["NamecardIcon"] = namecard_icon
-
+        rewards = await asyncio.to_thread(self._index, "rewards", "rewardId")
+        characters = await self._run_cpu(
+            cook_characters,
+            rewards,
+            self._data["fetter_character_card"],
+            self._data["namecards"],
+            self._data["characters"],
+        )
         await self._save_data("characters", characters)
 
+    @stage(
+        "artifacts",
+        "artifact_sets",
+        "talents",
+        "consts",
+        fields={
+            "artifacts": ["id", "rankLevel", "equipType", "icon", "setId"],
+            "artifact_sets": ["setId"],
+            "talents": [],
+            "consts": [],
+        },
+    )
+    @instrumented("stage")
     async def _cook_artifacts(self) -> None:
-        artifacts = self._data["artifacts"]
-        artifact_sets = self._data["artifact_sets"]
-        result: dict[str, Any] = {"Items": {}, "Sets": {}}
-
-        for artifact in artifacts:
-            with contextlib.suppress(KeyError):
-                result["Items"][str(artifact["id"])] = {
-                    "rarity": artifact["rankLevel"],
-                    "equipType": artifact["equipType"],
-                    "icon": artifact["icon"],
-                    "setId": artifact["setId"],
-                }
-
-        for artifact_set in artifact_sets:
-            result["Sets"][str(artifact_set["setId"])] = {
-                "name": "",
-            }
-
+        result = await self._run_cpu(
+            cook_artifacts, self._data["artifacts"], self._data["artifact_sets"]
+        )
         await self._save_data("artifacts", result)
 
+    @stage(
+        "fetter_character_card",
+        "rewards",
+        "talents",
+        "consts",
+        fields={
+            "fetter_character_card": [],
+            "rewards": [],
+            "talents": [],
+            "consts": [],
+        },
+    )
+    @instrumented("stage")
+    async def _cook_deobfuscations(self) -> None:
+        await self._save_data("deobfuscations", self._deobfuscations)
+
     async def download(self) -> None:
         await self._download_files()
-        await asyncio.gather(*[self._save_raw(name) for name in self._data])
+        self._http_cache.save()
 
     async def dump(self) -> None:
-        if not self._data:
-            await self._load_all_raw()
+        stages = await self._pending_stages(
+            [
+                self._cook_deobfuscations,
+                self._cook_characters,
+                self._cook_talents,
+                self._cook_consts,
+                self._cook_artifacts,
+                self._cook_text_map,
+            ]
+        )
+        if not stages:
+            LOGGER_.info("Nothing to cook, all inputs are unchanged")
+            return
 
         deobfuscator = GenshinDeobfuscator(self._data)
-        self._data = deobfuscator.deobfuscate()
-        await self._save_data("deobfuscations", deobfuscator.deobfuscations)
-
-        await self._cook_characters()
-        await self._cook_talents()
-        await self._cook_consts()
-        await self._cook_artifacts()
-        await self._cook_text_map()
+        await asyncio.to_thread(
+            deobfuscator.deobfuscate, self._load_output("deobfuscations")
+        )
+        self._deobfuscations = deobfuscator.deobfuscations
+
+        await self._run_stages(stages)
+        await self._commit_outputs()
 
         LOGGER_.info("Done!")
 
@@ -1,11 +1,13 @@
 import asyncio
 from collections import defaultdict
+import itertools
 import logging
-import re
 from typing import Any
 
+from ..asset_paths import normalize_paths, strip_avatar_dirs
 from ..base import JSONCooker
-from ..utils import async_error_handler
+from ..table import MISSING, Table
+from ..utils import instrumented, stage
 from .data import (
     HSR_JSON,
     LANGS,
@@ -21,6 +23,143 @@ from .data import (
 LOGGER_ = logging.getLogger(__name__)
 
 
+SKILL_FIELDS = (
+    "SkillID",
+    "SkillName.Hash",
+    "SkillDesc.Hash",
+    "SimpleSkillDesc.Hash",
+    "SkillIcon",
+    "SkillTag.Hash",
+    "SkillTypeDesc.Hash",
+    "SkillEffect",
+)
+SKILL_TEXT_FIELDS = (
+    "SkillName.Hash",
+    "SkillTag.Hash",
+    "SkillDesc.Hash",
+    "SimpleSkillDesc.Hash",
+    "SkillTypeDesc.Hash",
+)
+SKILL_LEVEL_UP_FIELDS = ("Level", "PointID", "LevelUpSkillID")
+SKILL_TREE_FIELDS = (
+    "PointID",
+    "AnchorType",
+    "IconPath",
+    "PointType",
+    "MaxLevel",
+    "StatusAddList",
+    "LevelUpSkillID",
+)
+PROPERTY_CONFIG_FIELDS = ("PropertyType", "IconPath")
+RELIC_SET_CONFIG_FIELDS = (
+    "SetID",
+    "SetName.Hash",
+    "SetIconPath",
+    "SetSkillList",
+    "IsPlanarSuit",
+)
+
+
+def cook_skill(skill_tree: Table, skill: Table) -> dict[str, dict[str, Any]]:
+    data: dict[str, dict[str, Any]] = {}
+    level_ups: dict[int, list[int]] = defaultdict(list)
+
+    for level, point_id, level_up_skill_ids in skill_tree.iter_columns(
+        *SKILL_LEVEL_UP_FIELDS
+    ):
+        if level != 1:
+            continue
+
+        for skill_id in level_up_skill_ids:
+            level_ups[skill_id].append(point_id)
+
+    for (
+        skill_id,
+        name,
+        desc,
+        simple_desc,
+        icon,
+        tag,
+        type_desc,
+        effect,
+    ) in skill.iter_columns(*SKILL_FIELDS):
+        key = str(skill_id)
+        data[key] = {
+            "name": name,
+            "desc": "" if desc is MISSING else desc,
+            "simple_desc": "" if simple_desc is MISSING else simple_desc,
+            "icon": icon,
+            "tag": tag,
+            "type_desc": "" if type_desc is MISSING else type_desc,
+            "effect": effect,
+        }
+        for point_id in level_ups.get(skill_id, []):
+            data[str(point_id)] = data[key]
+
+    return data
+
+
+def cook_skill_tree(
+    skill_tree: Table, skill_tree_ld: Table
+) -> dict[str, dict[str, Any]]:
+    data: dict[str, dict[str, Any]] = {}
+    icons = normalize_paths(
+        itertools.chain(
+            skill_tree.column("IconPath"), skill_tree_ld.column("IconPath")
+        ),
+        strip_avatar_dirs,
+    )
+
+    for (
+        point_id,
+        anchor_type,
+        icon_path,
+        point_type,
+        max_level,
+        status_add_list,
+        level_up_skill_ids,
+    ) in itertools.chain(
+        skill_tree.iter_columns(*SKILL_TREE_FIELDS),
+        skill_tree_ld.iter_columns(*SKILL_TREE_FIELDS),
+    ):
+        new_skill_data = data[str(point_id)] = {}
+        new_skill_data["anchor"] = anchor_type
+        new_skill_data["icon"] = icons[icon_path]
+        new_skill_data["pointType"] = point_type
+        new_skill_data["maxLevel"] = max_level
+
+        if status_add_list:
+            stat = status_add_list[0]
+            new_skill_data["addStatus"] = {
+                "type": stat["PropertyType"],
+                "value": stat["Value"]["Value"],
+            }
+
+        new_skill_data["skillIds"] = level_up_skill_ids
+
+    return data
+
+
+def cook_property_config(property_config: Table) -> dict[str, str]:
+    return dict(property_config.iter_columns(*PROPERTY_CONFIG_FIELDS))
+
+
+def cook_relic_set_config(relic_set_config: Table) -> dict[str, dict[str, Any]]:
+    data: dict[str, dict[str, Any]] = {}
+
+    for set_id, name, icon, set_nums, is_planar in relic_set_config.iter_columns(
+        *RELIC_SET_CONFIG_FIELDS
+    ):
+        data[str(set_id)] = {
+            "name": name,
+            "icon": icon,
+            "set_nums": set_nums,
+            "is_planar": False if is_planar is MISSING else is_planar,
+        }
+
+    return data
+
+
 class HSRJSONCooker(JSONCooker):
     _game = "hsr"
 
@@ -34,93 +173,70 @@ class HSRJSONCooker(JSONCooker):
             self._download(OLD_HSR_JSON, "old_hsr_json"),
             self._download(RELIC_SET_CONFIG, "relic_set_config"),
         ]
+        await asyncio.gather(*tasks)
 
-        for lang in LANGS:
-            tasks.append(
-                self._download(
-                    TEXT_MAP.format(lang=lang),
-                    f"text_map_{lang}",
+        # Parses the skill excel, keep it off the loop other games share
+        text_map_hahes = await asyncio.to_thread(self._text_map_hashes)
+        await asyncio.gather(
+            *[
+                self._download_text_map(
+                    TEXT_MAP.format(lang=lang), f"text_map_{lang}", text_map_hahes
                 )
-            )
+                for lang in LANGS
+            ]
+        )
 
-        await asyncio.gather(*tasks)
+    def _text_map_hashes(self) -> list[int]:
+        skill = self._data["skill"]
+        if not isinstance(skill, Table):
+            # The datasets are only projected once cooking
+            skill = Table.from_rows(skill, SKILL_TEXT_FIELDS)
 
-    @async_error_handler
+        text_map_hahes: list[int] = []
+        for name, tag, *optional in skill.iter_columns(*SKILL_TEXT_FIELDS):
+            text_map_hahes.append(name)
+            text_map_hahes.append(tag)
+            text_map_hahes.extend(h for h in optional if h is not MISSING)
+        return text_map_hahes
+
+    @stage(
+        "skill",
+        "skill_tree",
+        fields={"skill": SKILL_FIELDS, "skill_tree": SKILL_LEVEL_UP_FIELDS},
+    )
+    @instrumented("stage")
     async def _cook_skill(self) -> None:
-        skill_tree: list[dict[str, Any]] = self._data["skill_tree"]
-        skill: list[dict[str, Any]] = self._data["skill"]
-
-        data: dict[str, dict[str, Any]] = {}
-        level_ups: dict[int, list[int]] = defaultdict(list)
-
-        for point in skill_tree:
-            level = point["Level"]
-            if level != 1:
-                continue
-
-            point_id = point["PointID"]
-            level_up_skill_ids: list[int] = point["LevelUpSkillID"]
-            for skill_id in level_up_skill_ids:
-                level_ups[skill_id].append(point_id)
-
-        for s in skill:
-            skill_id = str(s["SkillID"])
-            data[skill_id] = {
-                "name": s["SkillName"]["Hash"],
-                "desc": s["SkillDesc"]["Hash"] if "SkillDesc" in s else "",
-                "simple_desc": s["SimpleSkillDesc"]["Hash"]
-                if "SimpleSkillDesc" in s
-                else "",
-                "icon": s["SkillIcon"],
-                "tag": s["SkillTag"]["Hash"],
-                "type_desc": s["SkillTypeDesc"]["Hash"] if "SkillTypeDesc" in s else "",
-                "effect": s["SkillEffect"],
-            }
-            for point_id in level_ups.get(s["SkillID"], []):
-                data[str(point_id)] = data[skill_id]
-
+        data = await self._run_cpu(
+            cook_skill, self._data["skill_tree"], self._data["skill"]
+        )
         await self._save_data("hsr/skill", data)
 
-    @async_error_handler
+    @stage(
+        "skill_tree",
+        "skill_tree_ld",
+        fields={"skill_tree": SKILL_TREE_FIELDS, "skill_tree_ld": SKILL_TREE_FIELDS},
+    )
+    @instrumented("stage")
     async def _cook_skill_tree(self) -> None:
-        skill_tree: list[dict[str, Any]] = self._data["skill_tree"]
-        skill_tree_ld: list[dict[str, Any]] = self._data["skill_tree_ld"]
-
-        data: dict[str, dict[str, Any]] = {}
-
-        for skill in skill_tree + skill_tree_ld:
-            skill_id = str(skill["PointID"])
-            new_skill_data = data[skill_id] = {}
-            new_skill_data["anchor"] = skill["AnchorType"]
-
-            icon_path = re.sub(r"Avatar/(\d+)/", "", skill["IconPath"])
-            new_skill_data["icon"] = icon_path
-            new_skill_data["pointType"] = skill["PointType"]
-            new_skill_data["maxLevel"] = skill["MaxLevel"]
-
-            if skill["StatusAddList"]:
-                stat = skill["StatusAddList"][0]
-                new_skill_data["addStatus"] = {
-                    "type": stat["PropertyType"],
-                    "value": stat["Value"]["Value"],
-                }
-
-            new_skill_data["skillIds"] = skill["LevelUpSkillID"]
-
+        data = await self._run_cpu(
+            cook_skill_tree, self._data["skill_tree"], self._data["skill_tree_ld"]
+        )
         await self._save_data("hsr/skill_tree", data)
 
-    @async_error_handler
+    @stage("property_config", fields={"property_config": PROPERTY_CONFIG_FIELDS})
+    @instrumented("stage")
     async def _cook_property_config(self) -> None:
-        property_config: list[dict[str, Any]] = self._data["property_config"]
-
-        data: dict[str, str] = {}
-
-        for property in property_config:
-            data[property["PropertyType"]] = property["IconPath"]
-
+        data = await self._run_cpu(cook_property_config, self._data["property_config"])
         await self._save_data("hsr/property_config", data)
 
-    @async_error_handler
+    @stage(
+        "hsr_json",
+        "old_hsr_json",
+        "skill",
+        *[f"text_map_{lang}" for lang in LANGS],
+        fields={"skill": SKILL_TEXT_FIELDS},
+    )
+    @instrumented("stage")
     async def _cook_hsr_json(self) -> None:
         # Merge old and new HSR JSONs
         hsr_json = self._data["hsr_json"]
@@ -129,58 +245,53 @@ class HSRJSONCooker(JSONCooker):
         for lang, text_map in old_hsr_json.items():
             hsr_json[lang] = {**hsr_json.get(lang, {}), **text_map}
 
-        text_map_hahes: list[int] = []
-        for skill in self._data["skill"]:
-            text_map_hahes.append(skill["SkillName"]["Hash"])
-            text_map_hahes.append(skill["SkillTag"]["Hash"])
-            if "SkillDesc" in skill:
-                text_map_hahes.append(skill["SkillDesc"]["Hash"])
-            if "SimpleSkillDesc" in skill:
-                text_map_hahes.append(skill["SimpleSkillDesc"]["Hash"])
-            if "SkillTypeDesc" in skill:
-                text_map_hahes.append(skill["SkillTypeDesc"]["Hash"])
+        text_map_hahes = await asyncio.to_thread(self._text_map_hashes)
+        text_maps = await self._filter_text_maps(
+            [f"text_map_{lang}" for lang in LANGS], text_map_hahes
+        )
 
         for lang, lang_code in LANGS.items():
-            text_map = self._data[f"text_map_{lang}"]
-
             # Add the translated texts to hsr.json
-            for text_map_hash in text_map_hahes:
-                string_tm_hash = str(text_map_hash)
-                if string_tm_hash in text_map:
-                    hsr_json[lang_code][string_tm_hash] = text_map[string_tm_hash]
+            hsr_json[lang_code].update(text_maps[f"text_map_{lang}"])
+
+        # Per-language files so a single-locale client only loads its own
+        index: dict[str, dict[str, Any]] = {}
+        for lang_code, text_map in hsr_json.items():
+            await self._save_data(f"hsr/hsr_{lang_code}", text_map)
+            index[lang_code] = {"file": f"hsr_{lang_code}.json", "count": len(text_map)}
 
+        await self._save_data("hsr/hsr_index", index)
         await self._save_data("hsr/hsr", hsr_json)
+        await self._save_text_map_bundle("hsr/hsr", hsr_json)
 
-    @async_error_handler
+    @stage("relic_set_config", fields={"relic_set_config": RELIC_SET_CONFIG_FIELDS})
+    @instrumented("stage")
     async def _cook_relic_set_config(self) -> None:
-        relic_set_config: list[dict[str, Any]] = self._data["relic_set_config"]
-
-        data: dict[str, dict[str, Any]] = {}
-
-        for relic in relic_set_config:
-            set_id = str(relic["SetID"])
-            data[set_id] = {
-                "name": relic["SetName"]["Hash"],
-                "icon": relic["SetIconPath"],
-                "set_nums": relic["SetSkillList"],
-                "is_planar": relic.get("IsPlanarSuit", False),
-            }
-
+        data = await self._run_cpu(
+            cook_relic_set_config, self._data["relic_set_config"]
+        )
         await self._save_data("hsr/relic_set", data)
 
     async def download(self) -> None:
         await self._download_files()
-        await asyncio.gather(*[self._save_raw(name) for name in self._data])
+        self._http_cache.save()
 
     async def dump(self) -> None:
-        if not self._data:
-            await self._load_all_raw()
-
-        await self._cook_skill()
-        await self._cook_skill_tree()
-        await self._cook_property_config()
-        await self._cook_hsr_json()
-        await self._cook_relic_set_config()
+        stages = await self._pending_stages(
+            [
+                self._cook_skill,
+                self._cook_skill_tree,
+                self._cook_property_config,
+                self._cook_hsr_json,
+                self._cook_relic_set_config,
+            ]
+        )
+        if not stages:
+            LOGGER_.info("Nothing to cook, all inputs are unchanged")
+            return
+
+        await self._run_stages(stages)
+        await self._commit_outputs()
 
         LOGGER_.info("Done!")
 
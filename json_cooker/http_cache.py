@@ -0,0 +1,80 @@
+from collections.abc import Mapping
+import logging
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+LOGGER_ = logging.getLogger(__name__)
+
+
+class HTTPCache:
+    """Manifest of the HTTP validators and content hash of every raw file, keyed by URL."""
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._urls: dict[str, str] = {}
+
+        if path.exists():
+            try:
+                self._entries = orjson.loads(path.read_bytes())
+            except orjson.JSONDecodeError:
+                LOGGER_.warning("Ignoring corrupted HTTP cache manifest %s", path)
+
+    def lookup(self, url: str, variant: str = "") -> dict[str, Any] | None:
+        """Return the cache entry of ``url`` if it can be used to revalidate the raw file.
+
+        ``variant`` identifies how the raw file was derived from the response,
+        an entry recorded with a different variant is not reusable.
+        """
+        entry = self._entries.get(url)
+        if entry is None or entry.get("variant", "") != variant:
+            return None
+        if "sha256" not in entry:
+            return None
+        return entry
+
+    @staticmethod
+    def conditional_headers(entry: dict[str, Any]) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        if etag := entry.get("etag"):
+            headers["If-None-Match"] = etag
+        if last_modified := entry.get("last_modified"):
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def store(
+        self,
+        url: str,
+        name: str,
+        headers: Mapping[str, str],
+        variant: str = "",
+    ) -> None:
+        """Record the validators of a fresh response, the hash is set once the raw file is saved."""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            self._entries.pop(url, None)
+            return
+
+        self._entries[url] = {
+            "name": name,
+            "etag": etag,
+            "last_modified": last_modified,
+            "variant": variant,
+        }
+        self._urls[name] = url
+
+    def set_hash(self, name: str, sha256: str) -> None:
+        url = self._urls.get(name)
+        if url is not None:
+            self._entries[url]["sha256"] = sha256
+
+    def save(self) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._path.write_bytes(
+            orjson.dumps(
+                self._entries, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+            )
+        )
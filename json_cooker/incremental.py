@@ -0,0 +1,67 @@
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+LOGGER_ = logging.getLogger(__name__)
+
+
+def code_digest() -> str:
+    """Digest of the cooker source code, a change invalidates every recorded stage."""
+    package = Path(__file__).parent
+    sha = hashlib.sha256()
+    for path in sorted(package.rglob("*.py")):
+        sha.update(path.relative_to(package).as_posix().encode())
+        sha.update(path.read_bytes())
+    return sha.hexdigest()
+
+
+class CookState:
+    """Input digests and outputs of the cook stages of the last run.
+
+    The state only holds if the cooker code and the written output formats,
+    given as their sorted suffixes, are the same as in the last run.
+    """
+
+    def __init__(self, path: Path, formats: list[str]) -> None:
+        self._path = path
+        self._code = code_digest()
+        self._formats = formats
+        self._stages: dict[str, dict[str, Any]] = {}
+
+        if not path.exists():
+            return
+        try:
+            state = orjson.loads(path.read_bytes())
+        except orjson.JSONDecodeError:
+            LOGGER_.warning("Ignoring corrupted cook state %s", path)
+            return
+
+        if state.get("code") != self._code:
+            LOGGER_.info("Cooker code changed, ignoring previous cook state")
+            return
+        if state.get("formats") != self._formats:
+            LOGGER_.info("Output formats changed, ignoring previous cook state")
+            return
+        self._stages = state.get("stages", {})
+
+    def is_fresh(self, stage: str, inputs: str) -> bool:
+        """Whether ``stage`` last ran with the same inputs and its outputs still exist."""
+        entry = self._stages.get(stage)
+        if entry is None or entry["inputs"] != inputs:
+            return False
+        return all(Path(f"data/{output}").exists() for output in entry["outputs"])
+
+    def record(self, stage: str, inputs: str, outputs: list[str]) -> None:
+        self._stages[stage] = {"inputs": inputs, "outputs": outputs}
+
+    def save(self) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._path.write_bytes(
+            orjson.dumps(
+                {"code": self._code, "formats": self._formats, "stages": self._stages},
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS,
+            )
+        )
@@ -0,0 +1,101 @@
+from datetime import UTC, datetime
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+LOGGER_ = logging.getLogger(__name__)
+
+
+def write_atomic(path: Path, content: bytes) -> None:
+    """Write ``path`` through a temporary file so it is never left truncated."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    try:
+        tmp.write_bytes(content)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def write_if_changed(path: Path, content: bytes) -> tuple[str, bool]:
+    """Atomically write ``path`` unless it already holds ``content``.
+
+    The size is compared first so only files of the same size get hashed.
+    Return the hash of ``content`` and whether the file was written.
+    """
+    sha256 = hashlib.sha256(content).hexdigest()
+    try:
+        unchanged = (
+            path.stat().st_size == len(content)
+            and hashlib.sha256(path.read_bytes()).hexdigest() == sha256
+        )
+    except FileNotFoundError:
+        unchanged = False
+
+    if not unchanged:
+        write_atomic(path, content)
+    return sha256, not unchanged
+
+
+class OutputManifest:
+    """Size, SHA-256 and generation time of every file written to ``data/``.
+
+    Clients compare it with their copy to only fetch the files that changed.
+    Several cookers share the manifest, so each one only merges the files it
+    wrote when saving.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._updates: dict[str, dict[str, Any] | None] = {}
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if not self._path.exists():
+            return {}
+        try:
+            return orjson.loads(self._path.read_bytes())["files"]
+        except (orjson.JSONDecodeError, KeyError):
+            LOGGER_.warning("Ignoring corrupted output manifest %s", self._path)
+            return {}
+
+    def _key(self, path: Path) -> str:
+        return path.relative_to(self._path.parent).as_posix()
+
+    def record(self, path: Path, sha256: str, size: int) -> None:
+        self._updates[self._key(path)] = {"size": size, "sha256": sha256}
+
+    def remove(self, path: Path) -> None:
+        self._updates[self._key(path)] = None
+
+    def save(self) -> None:
+        if not self._updates:
+            return
+
+        # Read-modify-write without awaiting so concurrent cookers cannot interleave
+        files = self._load()
+        now = datetime.now(UTC).isoformat(timespec="seconds")
+        for key, entry in self._updates.items():
+            if entry is None:
+                files.pop(key, None)
+                continue
+            previous = files.get(key)
+            if previous is not None and previous["sha256"] == entry["sha256"]:
+                entry = {**entry, "generated_at": previous["generated_at"]}
+            else:
+                entry = {**entry, "generated_at": now}
+            files[key] = entry
+        self._updates.clear()
+
+        content = orjson.dumps(
+            {"files": files}, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+        )
+        if self._path.exists() and self._path.read_bytes() == content:
+            return
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(self._path, content)
@@ -0,0 +1,94 @@
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from typing import Any
+
+import orjson
+
+from .compression import check_available, compress
+
+
+class OutputFormat(ABC):
+    """How a cooked artifact is encoded, written to ``data/{name}{suffix}``."""
+
+    suffix: str
+
+    @abstractmethod
+    def encode(self, data: Any) -> bytes: ...
+
+    def check_available(self) -> None:
+        """Raise if the format cannot be written in this environment."""
+
+
+class JSONFormat(OutputFormat):
+    def __init__(self, suffix: str, option: int) -> None:
+        self.suffix = suffix
+        self._option = option
+
+    def encode(self, data: Any) -> bytes:
+        return orjson.dumps(data, option=self._option)
+
+
+class CompressedFormat(OutputFormat):
+    """Another format compressed as a whole, for consumers to fetch."""
+
+    def __init__(
+        self, suffix: str, inner: OutputFormat, compression: str, level: int
+    ) -> None:
+        self.suffix = suffix
+        self.inner = inner
+        self._compression = compression
+        self._level = level
+
+    def encode(self, data: Any) -> bytes:
+        return self.compress(self.inner.encode(data))
+
+    def compress(self, raw: bytes) -> bytes:
+        return compress(raw, self._compression, self._level)
+
+    def check_available(self) -> None:
+        check_available(self._compression)
+
+
+INDENTED = JSONFormat(".json", orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+COMPACT = JSONFormat(".min.json", orjson.OPT_SORT_KEYS)
+
+# Outputs are written once per run and downloaded many times, so favor the ratio
+OUTPUT_FORMATS: dict[str, OutputFormat] = {
+    "indented": INDENTED,
+    "compact": COMPACT,
+    "gzip": CompressedFormat(".json.gz", COMPACT, "gzip", 9),
+    "zstd": CompressedFormat(".json.zst", COMPACT, "zstd", 19),
+}
+
+
+def get_output_formats(names: Iterable[str]) -> list[OutputFormat]:
+    """Resolve format names, the indented JSON is always written first."""
+    names = set(names)
+    unknown = names - OUTPUT_FORMATS.keys()
+    if unknown:
+        msg = f"Unknown output formats {sorted(unknown)}, expected some of {list(OUTPUT_FORMATS)}"
+        raise ValueError(msg)
+
+    formats = [
+        fmt
+        for name, fmt in OUTPUT_FORMATS.items()
+        if name == "indented" or name in names
+    ]
+    for fmt in formats:
+        fmt.check_available()
+    return formats
+
+
+def encode_outputs(data: Any, formats: Iterable[OutputFormat]) -> dict[str, bytes]:
+    """Encode ``data`` in every format, keyed by suffix.
+
+    Compressed formats reuse the bytes of their inner format when it is
+    also requested instead of serializing again.
+    """
+    encoded: dict[str, bytes] = {}
+    for fmt in formats:
+        if isinstance(fmt, CompressedFormat) and fmt.inner.suffix in encoded:
+            encoded[fmt.suffix] = fmt.compress(encoded[fmt.inner.suffix])
+        else:
+            encoded[fmt.suffix] = fmt.encode(data)
+    return encoded
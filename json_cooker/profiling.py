@@ -0,0 +1,144 @@
+from collections.abc import Iterator
+import contextlib
+from contextvars import ContextVar
+from pathlib import Path
+import threading
+import time
+import tracemalloc
+from typing import Any
+
+import orjson
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_profiler: "Profiler | None" = None
+_scope: ContextVar[str] = ContextVar("_scope", default="")
+_record: ContextVar[dict[str, Any] | None] = ContextVar("_record", default=None)
+
+
+def _max_rss() -> int | None:
+    """Peak resident set size of the process in bytes."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Profiler:
+    """Collects the wall time, bytes and memory of every instrumented step.
+
+    Steps of concurrent games and stages overlap, so the memory figures of a
+    step also include what ran alongside it. ``max_rss`` is the peak of the
+    whole process at the end of a step and ``max_rss_growth`` how much the
+    step raised that peak, 0 for a step that stayed below an earlier peak
+    however much it allocated. Only the tracemalloc figures are per step.
+    """
+
+    def __init__(self, *, trace_malloc: bool = False) -> None:
+        self.records: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._trace_malloc = trace_malloc
+        if trace_malloc:
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def profile(self, kind: str, name: str) -> Iterator[None]:
+        record: dict[str, Any] = {
+            "scope": _scope.get(),
+            "kind": kind,
+            "name": name,
+            "start": time.perf_counter() - self._start,
+            "bytes_read": 0,
+            "bytes_written": 0,
+            "status": "ok",
+        }
+        rss = _max_rss()
+        traced = tracemalloc.get_traced_memory()[0] if self._trace_malloc else 0
+        token = _record.set(record)
+        try:
+            yield
+        except BaseException:
+            record["status"] = "error"
+            raise
+        finally:
+            _record.reset(token)
+            record["wall"] = time.perf_counter() - self._start - record["start"]
+            max_rss = _max_rss()
+            if rss is not None and max_rss is not None:
+                record["max_rss"] = max_rss
+                record["max_rss_growth"] = max_rss - rss
+            if self._trace_malloc:
+                current, peak = tracemalloc.get_traced_memory()
+                record["tracemalloc_delta"] = current - traced
+                record["tracemalloc_peak"] = peak
+            with self._lock:
+                self.records.append(record)
+
+    def summary(self) -> list[dict[str, Any]]:
+        """Totals per scope and kind of step."""
+        totals: dict[tuple[str, str], dict[str, Any]] = {}
+        for record in self.records:
+            total = totals.setdefault(
+                (record["scope"], record["kind"]),
+                {
+                    "scope": record["scope"],
+                    "kind": record["kind"],
+                    "count": 0,
+                    "wall": 0.0,
+                    "bytes_read": 0,
+                    "bytes_written": 0,
+                    "max_rss": 0,
+                },
+            )
+            total["count"] += 1
+            total["wall"] += record["wall"]
+            total["bytes_read"] += record["bytes_read"]
+            total["bytes_written"] += record["bytes_written"]
+            total["max_rss"] = max(total["max_rss"], record.get("max_rss") or 0)
+        return sorted(totals.values(), key=lambda t: (t["scope"], t["kind"]))
+
+    def save(self, path: Path) -> None:
+        report = {
+            "summary": self.summary(),
+            "records": sorted(self.records, key=lambda r: r["start"]),
+        }
+        path.write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+    def format_summary(self) -> str:
+        lines = [
+            f"{'Scope':<10} {'Kind':<12} {'Count':>6} {'Wall':>10} "
+            f"{'Read (MB)':>10} {'Written (MB)':>13} {'Max RSS (MB)':>13}"
+        ]
+        for total in self.summary():
+            lines.append(
+                f"{total['scope']:<10} {total['kind']:<12} {total['count']:>6} "
+                f"{total['wall']:>9.2f}s {total['bytes_read'] / 1e6:>10.2f} "
+                f"{total['bytes_written'] / 1e6:>13.2f} {total['max_rss'] / 1e6:>13.1f}"
+            )
+        return "\n".join(lines)
+
+
+def enable(*, trace_malloc: bool = False) -> Profiler:
+    global _profiler
+    _profiler = Profiler(trace_malloc=trace_malloc)
+    return _profiler
+
+
+def get_profiler() -> Profiler | None:
+    return _profiler
+
+
+def set_scope(scope: str) -> None:
+    """Label the steps of the current task and the tasks it spawns, e.g. with the game."""
+    _scope.set(scope)
+
+
+def add_bytes(*, read: int = 0, written: int = 0) -> None:
+    """Account bytes transferred or written to the innermost running step."""
+    if (record := _record.get()) is not None:
+        record["bytes_read"] += read
+        record["bytes_written"] += written
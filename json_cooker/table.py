@@ -0,0 +1,145 @@
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from typing import Any
+
+
+class _Missing:
+    """Placeholder for a field a row does not have."""
+
+    _instance: "_Missing | None" = None
+
+    def __new__(cls) -> "_Missing":
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __reduce__(self) -> str:
+        # Stay a singleton across processes
+        return "MISSING"
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+    def __bool__(self) -> bool:
+        return False
+
+
+MISSING: Any = _Missing()
+
+
+class UnprojectedFieldError(LookupError):
+    """A field was read that is not a column of the table.
+
+    Unlike the ``KeyError`` of a field a row lacks, this is never taken for
+    an absent value: the ``fields`` a stage declares are out of sync with
+    what it reads.
+    """
+
+    def __init__(self, field: str, table: "Table") -> None:
+        super().__init__(
+            f"Field {field!r} is not projected, columns: {list(table.columns)}"
+        )
+        self.field = field
+
+
+class Row(Mapping[str, Any]):
+    """A read-only view of one row of a ``Table``, missing fields are absent."""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "Table", index: int) -> None:
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, field: str) -> Any:
+        value = self._table.column(field)[self._index]
+        if value is MISSING:
+            raise KeyError(field)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        index = self._index
+        for field, column in self._table.columns.items():
+            if column[index] is not MISSING:
+                yield field
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"Row({dict(self)!r})"
+
+
+class Table:
+    """Rows stored as one list per field instead of one dict per row.
+
+    Only the projected fields are kept, so the rest of each row can be freed
+    as soon as it is parsed. A dotted field such as ``SkillName.Hash`` is
+    flattened into its own column holding the nested value.
+    """
+
+    __slots__ = ("columns", "_length")
+
+    def __init__(self, columns: dict[str, list[Any]], length: int) -> None:
+        self.columns = columns
+        self._length = length
+
+    @classmethod
+    def from_rows(
+        cls, rows: Iterable[Mapping[str, Any]], fields: Iterable[str]
+    ) -> "Table":
+        """Keep ``fields`` of ``rows``, those a row lacks are stored as ``MISSING``."""
+        rows = list(rows)
+        columns: dict[str, list[Any]] = {}
+        for field in fields:
+            head, *path = field.split(".")
+            column = [row.get(head, MISSING) for row in rows]
+            # Flatten one level at a time over the whole column
+            for part in path:
+                column = [
+                    value.get(part, MISSING) if type(value) is dict else MISSING
+                    for value in column
+                ]
+            columns[field] = column
+        return cls(columns, len(rows))
+
+    def column(self, field: str) -> list[Any]:
+        try:
+            return self.columns[field]
+        except KeyError:
+            raise UnprojectedFieldError(field, self) from None
+
+    def iter_columns(self, *fields: str) -> Iterator[tuple[Any, ...]]:
+        """Iterate over the rows as tuples of the values of ``fields``."""
+        return zip(*(self.column(field) for field in fields), strict=True)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> Row:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return Row(self, index)
+
+    def __iter__(self) -> Iterator[Row]:
+        for index in range(self._length):
+            yield Row(self, index)
+
+    def __repr__(self) -> str:
+        return f"Table({list(self.columns)!r}, {self._length} rows)"
+
+
+def projection(fields: Iterable[str]) -> Callable[[Any], Any]:
+    """A ``Datasets`` transform turning a list of rows into a ``Table`` of ``fields``.
+
+    Datasets that are not a list of rows are left untouched.
+    """
+    fields = tuple(sorted(fields))
+
+    def project(value: Any) -> Any:
+        if isinstance(value, list) and all(type(row) is dict for row in value):
+            return Table.from_rows(value, fields)
+        return value
+
+    return project
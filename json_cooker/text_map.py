@@ -0,0 +1,254 @@
+import bisect
+from collections.abc import Collection, Mapping, Sequence
+import hashlib
+import mmap
+from pathlib import Path
+import re
+import struct
+import sys
+from types import TracebackType
+
+import orjson
+
+from .compression import read_raw
+
+# A single `"key": value,` member of a flat JSON object, value being a string or a scalar
+_MEMBER = re.compile(
+    rb'\s*"([^"\\]*(?:\\.[^"\\]*)*)"\s*:\s*'
+    rb'("[^"\\]*(?:\\.[^"\\]*)*"|[^\s,{}\[\]"]+)\s*([,}])',
+    re.DOTALL,
+)
+_OBJECT_START = re.compile(rb"\s*\{")
+_OBJECT_END = re.compile(rb"\s*\}")
+
+# Text map bundle layout, little-endian:
+#   header        magic, version, language count, key count
+#   languages     per language: code, offset of its section
+#   index         key count sorted int64 keys
+#   sections      per language: key count (offset, length) pairs into the
+#                 language blob, then the UTF-8 blob itself
+_BUNDLE_MAGIC = b"ETMB"
+_BUNDLE_VERSION = 1
+_BUNDLE_HEADER = struct.Struct("<4sHHQ")
+_BUNDLE_LANGUAGE = struct.Struct("<8sQ")
+_BUNDLE_ENTRY = struct.Struct("<II")
+_MISSING = 0xFFFFFFFF
+
+
+def filter_text_map(
+    text_map: dict[str, str], hashes: Collection[str]
+) -> dict[str, str]:
+    """Keep only the entries of ``text_map`` whose hash is in ``hashes``."""
+    return {h: text_map[h] for h in hashes if h in text_map}
+
+
+def load_and_filter_text_map(path: Path, hashes: Collection[str]) -> dict[str, str]:
+    """Load a raw TextMap from disk and filter it, meant to run in a worker process."""
+    return filter_text_map(orjson.loads(read_raw(path)), hashes)
+
+
+class TextMapStreamFilter:
+    """Incrementally parse a TextMap fed in chunks, keeping only the wanted hashes.
+
+    TextMaps are flat ``{hash: text}`` objects, so only the current, possibly
+    incomplete, member is ever buffered.
+    """
+
+    def __init__(self, hashes: Collection[str]) -> None:
+        self._hashes = hashes
+        self._buffer = b""
+        self._started = False
+        self._empty = True
+        self._done = False
+        self.result: dict[str, str] = {}
+
+    def feed(self, chunk: bytes) -> None:
+        if self._done:
+            return
+
+        buffer = self._buffer + chunk
+        pos = 0
+
+        if not self._started:
+            match = _OBJECT_START.match(buffer)
+            if match is None:
+                if buffer.strip():
+                    raise ValueError("TextMap is not a JSON object")
+                self._buffer = buffer
+                return
+            self._started = True
+            pos = match.end()
+
+        if self._empty:
+            # The closing brace of `{}` may only come with a later chunk
+            if _OBJECT_END.match(buffer, pos) is not None:
+                self._done = True
+                self._buffer = b""
+                return
+
+        hashes = self._hashes
+        result = self.result
+        member = _MEMBER.match
+        while (match := member(buffer, pos)) is not None:
+            key = match[1]
+            str_key = orjson.loads(b'"' + key + b'"') if b"\\" in key else key.decode()
+            if str_key in hashes:
+                result[str_key] = orjson.loads(match[2])
+
+            pos = match.end()
+            self._empty = False
+            if match[3] == b"}":
+                self._done = True
+                break
+
+        self._buffer = buffer[pos:]
+
+    def close(self) -> dict[str, str]:
+        if not self._done:
+            raise ValueError("TextMap stream ended before the end of the object")
+        return self.result
+
+
+def bundle_key(key: str | int) -> int:
+    """The int64 index key of a text map key.
+
+    Numeric keys are text hashes and are used as is, the few named keys
+    (e.g. ``FIGHT_PROP_HP``) are hashed into values with bit 62 set, away
+    from the range of the game hashes.
+    """
+    if isinstance(key, int):
+        return key
+    try:
+        return int(key)
+    except ValueError:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") & ((1 << 62) - 1) | (1 << 62)
+
+
+def build_text_map_bundle(text_maps: Mapping[str, Mapping[str, str]]) -> bytes:
+    """Pack ``{lang: {key: text}}`` into a bundle readable by ``TextMapBundle``."""
+    keys_by_index: dict[int, str] = {}
+    for text_map in text_maps.values():
+        for key in text_map:
+            index_key = bundle_key(key)
+            if keys_by_index.setdefault(index_key, key) != key:
+                msg = f"Text map keys {keys_by_index[index_key]!r} and {key!r} collide"
+                raise ValueError(msg)
+    index = sorted(keys_by_index)
+
+    header_size = _BUNDLE_HEADER.size + _BUNDLE_LANGUAGE.size * len(text_maps)
+    offset = header_size + 8 * len(index)
+    languages: list[bytes] = []
+    sections: list[bytes] = []
+    for lang, text_map in text_maps.items():
+        code = lang.encode()
+        if len(code) > _BUNDLE_LANGUAGE.size - 8:
+            msg = f"Language code {lang!r} is too long"
+            raise ValueError(msg)
+        languages.append(_BUNDLE_LANGUAGE.pack(code, offset))
+
+        entries = bytearray()
+        blob = bytearray()
+        for index_key in index:
+            text = text_map.get(keys_by_index[index_key])
+            if text is None:
+                entries += _BUNDLE_ENTRY.pack(0, _MISSING)
+                continue
+            encoded = text.encode()
+            entries += _BUNDLE_ENTRY.pack(len(blob), len(encoded))
+            blob += encoded
+
+        sections.append(bytes(entries + blob))
+        offset += len(entries) + len(blob)
+
+    return b"".join(
+        [
+            _BUNDLE_HEADER.pack(
+                _BUNDLE_MAGIC, _BUNDLE_VERSION, len(text_maps), len(index)
+            ),
+            *languages,
+            struct.pack(f"<{len(index)}q", *index),
+            *sections,
+        ]
+    )
+
+
+class TextMapBundle:
+    """Look texts up in a text map bundle without loading it.
+
+    The file is memory-mapped and keys are found by binary search over the
+    sorted index, so only the pages actually looked up are read.
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, lang_count, key_count = _BUNDLE_HEADER.unpack_from(self._mmap)
+        if magic != _BUNDLE_MAGIC or version != _BUNDLE_VERSION:
+            self._mmap.close()
+            msg = f"{path} is not a version {_BUNDLE_VERSION} text map bundle"
+            raise ValueError(msg)
+
+        self._key_count = key_count
+        self._sections: dict[str, int] = {}
+        for i in range(lang_count):
+            code, offset = _BUNDLE_LANGUAGE.unpack_from(
+                self._mmap, _BUNDLE_HEADER.size + i * _BUNDLE_LANGUAGE.size
+            )
+            self._sections[code.rstrip(b"\0").decode()] = offset
+
+        start = _BUNDLE_HEADER.size + lang_count * _BUNDLE_LANGUAGE.size
+        view = memoryview(self._mmap)[start : start + 8 * key_count]
+        if sys.byteorder == "little":
+            self._index: Sequence[int] = view.cast("q")
+        else:
+            self._index = struct.unpack(f"<{key_count}q", view)
+
+    @property
+    def languages(self) -> list[str]:
+        return list(self._sections)
+
+    def __len__(self) -> int:
+        return self._key_count
+
+    def _position(self, key: str | int) -> int | None:
+        index_key = bundle_key(key)
+        position = bisect.bisect_left(self._index, index_key)
+        if position < self._key_count and self._index[position] == index_key:
+            return position
+        return None
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, (str, int)) and self._position(key) is not None
+
+    def get(self, lang: str, key: str | int, default: str | None = None) -> str | None:
+        """Return the text of ``key`` in ``lang``, ``default`` if it has none."""
+        section = self._sections[lang]
+        position = self._position(key)
+        if position is None:
+            return default
+
+        offset, length = _BUNDLE_ENTRY.unpack_from(
+            self._mmap, section + position * _BUNDLE_ENTRY.size
+        )
+        if length == _MISSING:
+            return default
+        blob = section + self._key_count * _BUNDLE_ENTRY.size + offset
+        return self._mmap[blob : blob + length].decode()
+
+    def close(self) -> None:
+        if isinstance(self._index, memoryview):
+            self._index.release()
+        self._mmap.close()
+
+    def __enter__(self) -> "TextMapBundle":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
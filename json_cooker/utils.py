@@ -1,15 +1,92 @@
-import logging
-from typing import Any, Callable
+from collections.abc import Iterable, Mapping
+import contextlib
+import functools
+import inspect
+from typing import Any, Callable, TypeVar, cast
 
-LOGGER_ = logging.getLogger(__name__)
+from .profiling import get_profiler
 
+F = TypeVar("F", bound=Callable[..., Any])
 
-def async_error_handler(func: Callable[..., Any]) -> Callable[..., Any]:
-    async def wrapper(*args: Any, **kwargs: Any) -> Any:
-        try:
-            return await func(*args, **kwargs)
-        except Exception:
-            LOGGER_.exception("An error occurred while running %s", func.__name__)
-            raise
 
-    return wrapper
+def instrumented(kind: str, *, label: str | None = None) -> Callable[[F], F]:
+    """Profile a step when profiling is enabled.
+
+    Works on both sync and async functions. The step is named after the
+    function, suffixed with the value of its ``label`` argument if given.
+    Errors are not logged here but once by the caller of the cooker, the
+    step they went through is added to them as a note instead.
+    """
+
+    def decorator(func: F) -> F:
+        signature = inspect.signature(func)
+
+        def step_name(args: tuple[Any, ...], kwargs: dict[str, Any]) -> str:
+            name = func.__qualname__
+            if label is not None:
+                value = signature.bind(*args, **kwargs).arguments[label]
+                name = f"{name}[{value}]"
+            return name
+
+        def profile(
+            args: tuple[Any, ...], kwargs: dict[str, Any]
+        ) -> contextlib.AbstractContextManager[None]:
+            profiler = get_profiler()
+            if profiler is None:
+                return contextlib.nullcontext()
+            return profiler.profile(kind, step_name(args, kwargs))
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                try:
+                    with profile(args, kwargs):
+                        return await func(*args, **kwargs)
+                except Exception as e:
+                    e.add_note(f"While running {step_name(args, kwargs)}")
+                    raise
+
+            return cast(F, async_wrapper)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            try:
+                with profile(args, kwargs):
+                    return func(*args, **kwargs)
+            except Exception as e:
+                e.add_note(f"While running {step_name(args, kwargs)}")
+                raise
+
+        return cast(F, wrapper)
+
+    return decorator
+
+
+def stage(
+    *inputs: str, fields: Mapping[str, Iterable[str]] | None = None
+) -> Callable[[F], F]:
+    """Declare the raw datasets a cook stage consumes.
+
+    ``fields`` optionally lists the only fields the stage reads from the
+    rows of some of its inputs, the others are needed whole.
+    """
+    projections = {name: frozenset(f) for name, f in (fields or {}).items()}
+    if unknown := projections.keys() - set(inputs):
+        msg = f"Fields declared for datasets that are not inputs: {sorted(unknown)}"
+        raise ValueError(msg)
+
+    def decorator(func: F) -> F:
+        setattr(func, "__stage_inputs__", inputs)
+        setattr(func, "__stage_fields__", projections)
+        return func
+
+    return decorator
+
+
+def stage_inputs(func: Callable[..., Any]) -> tuple[str, ...]:
+    return getattr(func, "__stage_inputs__", ())
+
+
+def stage_fields(func: Callable[..., Any]) -> dict[str, frozenset[str]]:
+    return getattr(func, "__stage_fields__", {})
@@ -2,9 +2,10 @@ import asyncio
 import logging
 from typing import Any
 
-import orjson
-
+from ..asset_paths import asset_suffixes, normalize_paths, zzz_ui_icons
 from ..base import JSONCooker
+from ..deobfuscation import Deobfuscator, Rule, contains, first_item, is_list
+from ..utils import instrumented, stage
 from .data import (
     AVATAR_SKILL_LEVEL,
     BUDDY_LEVEL_ADVANCE,
@@ -31,294 +32,102 @@ TITLE_COLOR_SCHEME = {
 }
 
 
-class ZZZDeobfuscator:
-    def __init__(self, data: dict[str, Any]) -> None:
-        self._data = data
-        self.deobfuscations: dict[str, str] = {}
-
-    def Items(self) -> None:
-        Items = next(iter(self._data["equipment_level"]), None)
-        if Items is None:
-            raise ValueError("Failed to find Items in 'equipment_level'")
-        self.deobfuscations["Items"] = Items
-
-    def Rarity(self) -> None:
-        Items = self.deobfuscations["Items"]
-        Rarity = next(
-            (k for k, v in self._data["equipment_level"][Items][0].items() if v == 2),
-            None,
-        )
-        if Rarity is None:
-            raise ValueError("Failed to find Rarity in 'equipment_level'")
-        self.deobfuscations["Rarity"] = Rarity
-
-    def Level(self) -> None:
-        Items = self.deobfuscations["Items"]
-        Level = next(
-            (k for k, v in self._data["equipment_level"][Items][1].items() if v == 1),
-            None,
-        )
-        if Level is None:
-            raise ValueError("Failed to find Level in 'equipment_level'")
-        self.deobfuscations["Level"] = Level
-
-    def EnhanceRate(self) -> None:
-        Items = self.deobfuscations["Items"]
-        EnhanceRate = next(
-            (k for k, v in self._data["weapon_level"][Items][1].items() if v == 1568),
-            None,
-        )
-        if EnhanceRate is None:
-            raise ValueError("Failed to find EnhanceRate in 'weapon_level'")
-        self.deobfuscations["EnhanceRate"] = EnhanceRate
-
-    def Exp(self) -> None:
-        Items = self.deobfuscations["Items"]
-        Exp = next(
-            (k for k, v in self._data["weapon_level"][Items][1].items() if v == 60),
-            None,
-        )
-        if Exp is None:
-            raise ValueError("Failed to find Exp in 'weapon_level'")
-        self.deobfuscations["Exp"] = Exp
-
-    def ExpRecycleRate(self) -> None:
-        Items = self.deobfuscations["Items"]
-        ExpRecycleRate = next(
-            (k for k, v in self._data["weapon_level"][Items][0].items() if v == 10000),
-            None,
-        )
-        if ExpRecycleRate is None:
-            raise ValueError("Failed to find ExpRecycleRate in 'weapon_level'")
-        self.deobfuscations["ExpRecycleRate"] = ExpRecycleRate
-
-    def Star(self) -> None:
-        Items = self.deobfuscations["Items"]
-        Star = next(
-            (k for k, v in self._data["buddy_star"][Items][1].items() if v == 2),
-            None,
-        )
-        if Star is None:
-            raise ValueError("Failed to find Star in 'buddy_star'")
-        self.deobfuscations["Star"] = Star
-
-    def ItemID(self) -> None:
-        Items = self.deobfuscations["Items"]
-        ItemID = next(
-            (
-                k
-                for i in self._data["equipment"][Items]
-                for k, v in i.items()
-                if v == 31021
-            ),
-            None,
-        )
-        if ItemID is None:
-            raise ValueError("Failed to find ItemID in 'equipment'")
-        self.deobfuscations["ItemID"] = ItemID
-
-    def ID(self) -> None:
-        Items = self.deobfuscations["Items"]
-        ID = next(
-            (
-                k
-                for k, v in self._data["avatar_skill_level"][Items][0].items()
-                if v == 1011001
-            ),
-            None,
-        )
-        if ID is None:
-            raise ValueError("Failed to find ID in 'avatar_skill_level'")
-        self.deobfuscations["ID"] = ID
-
-    def AvatarID(self) -> None:
-        Items = self.deobfuscations["Items"]
-        AvatarID = next(
-            (
-                k
-                for k, v in self._data["avatar_skill_level"][Items][0].items()
-                if v == 1011
-            ),
-            None,
-        )
-        if AvatarID is None:
-            raise ValueError("Failed to find AvatarID in 'avatar_skill_level'")
-        self.deobfuscations["AvatarID"] = AvatarID
-
-    def SkillMaterials(self) -> None:
-        Items = self.deobfuscations["Items"]
-        ItemID = self.deobfuscations["ItemID"]
-
-        for k, v in self._data["avatar_skill_level"][Items][0].items():
-            print(k, v)
-
-        SkillMaterials = next(
-            (
-                k
-                for k, v in self._data["avatar_skill_level"][Items][0].items()
-                if isinstance(v, list) and v and v[0][ItemID] == 10
-            ),
-            None,
-        )
-        if SkillMaterials is None:
-            raise ValueError("Failed to find SkillMaterials in 'avatar_skill_level'")
-        self.deobfuscations["SkillMaterials"] = SkillMaterials
-
-    def BreakLevel(self) -> None:
-        Items = self.deobfuscations["Items"]
-        BreakLevel = next(
-            (
-                k
-                for k, v in self._data["buddy_level_advance"][Items][2].items()
-                if v == 2
-            ),
-            None,
-        )
-        if BreakLevel is None:
-            raise ValueError("Failed to find BreakLevel in 'buddy_level_advance'")
-        self.deobfuscations["BreakLevel"] = BreakLevel
-
-    def StarRate(self) -> None:
-        Items = self.deobfuscations["Items"]
-        StarRate = next(
-            (k for k, v in self._data["weapon_star"][Items][1].items() if v == 8922),
-            None,
-        )
-        if StarRate is None:
-            raise ValueError("Failed to find StarRate in 'weapon_star'")
-        self.deobfuscations["StarRate"] = StarRate
-
-    def RandRate(self) -> None:
-        Items = self.deobfuscations["Items"]
-        RandRate = next(
-            (k for k, v in self._data["weapon_star"][Items][1].items() if v == 3000),
-            None,
-        )
-        if RandRate is None:
-            raise ValueError("Failed to find RandRate in 'weapon_star'")
-        self.deobfuscations["RandRate"] = RandRate
-
-    def TitleID(self) -> None:
-        Items = self.deobfuscations["Items"]
-        TitleID = next(
-            (
-                k
-                for k, v in self._data["title_config"][Items][0].items()
-                if v == 3800100
-            ),
-            None,
-        )
-        if TitleID is None:
-            raise ValueError("Failed to find TitleID in 'title_config'")
-        self.deobfuscations["TitleID"] = TitleID
-
-    def TitleText(self) -> None:
-        Items = self.deobfuscations["Items"]
-        TitleText = next(
-            (
-                k
-                for item in self._data["title_config"][Items]
-                for k, v in item.items()
-                if isinstance(v, str) and "TitleText" in v
-            ),
-            None,
-        )
-        if TitleText is None:
-            raise ValueError("Failed to find TitleText in 'title_config'")
-        self.deobfuscations["TitleText"] = TitleText
-
-    def TitleAsset(self) -> None:
-        Items = self.deobfuscations["Items"]
-        TitleAsset = next(
-            (
-                k
-                for item in self._data["title_config"][Items]
-                for k, v in item.items()
-                if v == "Assets/NapResources/UI/Materials/General/UI_Title_Default.mat"
-            ),
-            None,
-        )
-        if TitleAsset is None:
-            raise ValueError("Failed to find TitleAsset in 'title_config'")
-        self.deobfuscations["TitleAsset"] = TitleAsset
-
-    def CallingCardID(self) -> None:
-        Items = self.deobfuscations["Items"]
-        CallingCardID = next(
-            (
-                k
-                for item in self._data["namecards"][Items]
-                for k, v in item.items()
-                if v == 3300001
-            ),
-            None,
-        )
-        if CallingCardID is None:
-            raise ValueError("Failed to find CallingCardID in 'namecards'")
-        self.deobfuscations["CallingCardID"] = CallingCardID
-
-    def Icon(self) -> None:
-        Items = self.deobfuscations["Items"]
-        icon_path = "Assets/NapResources/UI/Sprite/A1DynamicLoad/FriendCard/UnPacker/ImgCardCommon01.png"
-        Icon = next(
-            (
-                k
-                for item in self._data["namecards"][Items]
-                for k, v in item.items()
-                if v == icon_path
-            ),
-            None,
-        )
-        if Icon is None:
-            raise ValueError("Failed to find Icon in 'namecards'")
-        self.deobfuscations["Icon"] = Icon
-
-    def Name(self) -> None:
-        Items = self.deobfuscations["Items"]
-        Name = next(
-            (
-                k
-                for item in self._data["equipment_suit"][Items]
-                for k, v in item.items()
-                if isinstance(v, str) and "name" in v
-            ),
-            None,
-        )
-        if Name is None:
-            raise ValueError("Failed to find Name in 'equipment_suit'")
-        self.deobfuscations["Name"] = Name
-
-    def deobfuscate(self) -> dict[str, Any]:
-        self.Items()
-        self.Rarity()
-        self.Level()
-        self.EnhanceRate()
-        self.Exp()
-        self.ExpRecycleRate()
-        self.Star()
-        self.ItemID()
-        self.ID()
-        self.AvatarID()
-        self.SkillMaterials()
-        self.BreakLevel()
-        self.StarRate()
-        self.RandRate()
-        self.TitleID()
-        self.TitleText()
-        self.TitleAsset()
-        self.CallingCardID()
-        self.Icon()
-        self.Name()
-
-        LOGGER_.info("Deobfuscations: %s", self.deobfuscations)
-
-        for k, v in self._data.items():
-            str_v = orjson.dumps(v).decode()
-            for deobfuscated, obfuscated in self.deobfuscations.items():
-                str_v = str_v.replace(obfuscated, deobfuscated)
-            self._data[k] = orjson.loads(str_v)
-
-        return self._data
+class ZZZDeobfuscator(Deobfuscator):
+    datasets = (
+        "equipment_level",
+        "equipment_suit",
+        "equipment",
+        "weapon_level",
+        "weapon_star",
+        "buddy_star",
+        "buddy_level_advance",
+        "avatar_skill_level",
+        "title_config",
+        "namecards",
+    )
+
+    rules = (
+        Rule("Items", "equipment_level", is_list),
+        Rule("Rarity", "equipment_level", 2, rows=0, path=("Items",)),
+        Rule("Level", "equipment_level", 1, rows=1, path=("Items",)),
+        Rule("EnhanceRate", "weapon_level", 1568, rows=1, path=("Items",)),
+        Rule("Exp", "weapon_level", 60, rows=1, path=("Items",)),
+        Rule("ExpRecycleRate", "weapon_level", 10000, rows=0, path=("Items",)),
+        Rule("Star", "buddy_star", 2, rows=1, path=("Items",)),
+        Rule("ItemID", "equipment", 31021, path=("Items",)),
+        Rule("ID", "avatar_skill_level", 1011001, rows=0, path=("Items",)),
+        Rule("AvatarID", "avatar_skill_level", 1011, rows=0, path=("Items",)),
+        Rule(
+            "SkillMaterials",
+            "avatar_skill_level",
+            first_item("ItemID", 10),
+            rows=0,
+            path=("Items",),
+        ),
+        Rule("BreakLevel", "buddy_level_advance", 2, rows=2, path=("Items",)),
+        Rule("StarRate", "weapon_star", 8922, rows=1, path=("Items",)),
+        Rule("RandRate", "weapon_star", 3000, rows=1, path=("Items",)),
+        Rule("TitleID", "title_config", 3800100, rows=0, path=("Items",)),
+        Rule("TitleText", "title_config", contains("TitleText"), path=("Items",)),
+        Rule(
+            "TitleAsset",
+            "title_config",
+            "Assets/NapResources/UI/Materials/General/UI_Title_Default.mat",
+            path=("Items",),
+        ),
+        Rule("CallingCardID", "namecards", 3300001, path=("Items",)),
+        Rule(
+            "Icon",
+            "namecards",
+            "Assets/NapResources/UI/Sprite/A1DynamicLoad/FriendCard/UnPacker/ImgCardCommon01.png",
+            path=("Items",),
+        ),
+        Rule("Name", "equipment_suit", contains("name"), path=("Items",)),
+    )
+
+
+def cook_titles(title_config: dict[str, Any]) -> dict[str, Any]:
+    result: dict[str, Any] = {}
+    items = title_config["Items"]
+    variants = normalize_paths(
+        (item.get("TitleAsset", "_") for item in items), asset_suffixes
+    )
+
+    for item in items:
+        color_scheme = TITLE_COLOR_SCHEME.get(
+            variants[item.get("TitleAsset", "_")], TITLE_COLOR_SCHEME["_"]
+        )
+        result[str(item["TitleID"])] = {
+            "TitleText": item["TitleText"],
+            "ColorA": color_scheme[0],
+            "ColorB": color_scheme[1],
+        }
+
+    return result
+
+
+def cook_namecards(namecards: dict[str, Any]) -> dict[str, Any]:
+    result: dict[str, Any] = {}
+    items = namecards["Items"]
+    icons = normalize_paths((item["Icon"] for item in items), zzz_ui_icons)
+
+    for item in items:
+        result[str(item["CallingCardID"])] = {
+            "Icon": icons[item["Icon"]],
+        }
+
+    return result
+
+
+def cook_equipment_suits(equipment_suit: dict[str, Any]) -> dict[str, Any]:
+    result: dict[str, Any] = {}
+
+    for item in equipment_suit["Items"]:
+        result[str(item["ID"])] = {
+            "Name": item["Name"],
+        }
+
+    return result
 
 
 class ZZZJSONCooker(JSONCooker):
@@ -339,64 +148,62 @@ class ZZZJSONCooker(JSONCooker):
         ]
         await asyncio.gather(*tasks)
 
+    @stage(*ZZZDeobfuscator.datasets)
+    @instrumented("stage")
     async def _cook_titles(self) -> None:
-        title_config = self._data["title_config"]
-        result: dict[str, Any] = {}
-
-        for item in title_config["Items"]:
-            color_scheme = TITLE_COLOR_SCHEME.get(
-                item.get("TitleAsset", "_").split("_")[-1].split(".")[0],
-                TITLE_COLOR_SCHEME["_"],
-            )
-            result[str(item["TitleID"])] = {
-                "TitleText": item["TitleText"],
-                "ColorA": color_scheme[0],
-                "ColorB": color_scheme[1],
-            }
-
+        result = await self._run_cpu(cook_titles, self._data["title_config"])
         await self._save_data("zzz/titles", result)
 
+    @stage(*ZZZDeobfuscator.datasets)
+    @instrumented("stage")
     async def _cook_namecards(self) -> None:
-        namecards = self._data["namecards"]
-        result: dict[str, Any] = {}
-
-        for item in namecards["Items"]:
-            result[str(item["CallingCardID"])] = {
-                "Icon": f"/ui/zzz/{item['Icon'].split('/')[-1]}",
-            }
-
+        result = await self._run_cpu(cook_namecards, self._data["namecards"])
         await self._save_data("zzz/namecards", result)
 
+    @stage(*ZZZDeobfuscator.datasets)
+    @instrumented("stage")
     async def _cook_equipment_suits(self) -> None:
-        equipment_suit = self._data["equipment_suit"]
-        result: dict[str, Any] = {}
+        result = await self._run_cpu(cook_equipment_suits, self._data["equipment_suit"])
+        await self._save_data("zzz/equipment_suits", result)
 
-        for item in equipment_suit["Items"]:
-            result[str(item["ID"])] = {
-                "Name": item["Name"],
-            }
+    @stage(*ZZZDeobfuscator.datasets)
+    @instrumented("stage")
+    async def _cook_deobfuscations(self) -> None:
+        await self._save_data("zzz/deobfuscations", self._deobfuscations)
 
-        await self._save_data("zzz/equipment_suits", result)
+    @stage(*ZZZDeobfuscator.datasets)
+    @instrumented("stage")
+    async def _cook_levels(self) -> None:
+        await self._save_data("zzz/equipment_level", self._data["equipment_level"])
+        await self._save_data("zzz/weapon_level", self._data["weapon_level"])
+        await self._save_data("zzz/weapon_star", self._data["weapon_star"])
 
     async def download(self) -> None:
         await self._download_files()
-        await asyncio.gather(*[self._save_raw(name) for name in self._data])
+        self._http_cache.save()
 
     async def dump(self) -> None:
-        if not self._data:
-            await self._load_all_raw()
+        stages = await self._pending_stages(
+            [
+                self._cook_deobfuscations,
+                self._cook_levels,
+                self._cook_titles,
+                self._cook_namecards,
+                self._cook_equipment_suits,
+            ]
+        )
+        if not stages:
+            LOGGER_.info("Nothing to cook, all inputs are unchanged")
+            return
 
         deobfuscator = ZZZDeobfuscator(self._data)
-        self._data = deobfuscator.deobfuscate()
-        await self._save_data("zzz/deobfuscations", deobfuscator.deobfuscations)
-
-        await self._save_data("zzz/equipment_level", self._data["equipment_level"])
-        await self._save_data("zzz/weapon_level", self._data["weapon_level"])
-        await self._save_data("zzz/weapon_star", self._data["weapon_star"])
+        await asyncio.to_thread(
+            deobfuscator.deobfuscate, self._load_output("zzz/deobfuscations")
+        )
+        self._deobfuscations = deobfuscator.deobfuscations
 
-        await self._cook_titles()
-        await self._cook_namecards()
-        await self._cook_equipment_suits()
+        await self._run_stages(stages)
+        await self._commit_outputs()
 
         LOGGER_.info("Done!")
 